@@ -0,0 +1,657 @@
+import os
+import re
+import json
+import time
+import hashlib
+import weakref
+import threading
+import functools
+import multiprocessing
+from array import array
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import nltk
+import numpy as np
+import pandas as pd
+import textblob
+from textblob import TextBlob
+
+from analysis_cache import AnalysisCache
+from metrics import METRICS
+
+# ---------- NLTK setup ----------
+NLTK_RESOURCES = ["tokenizers/punkt", "tokenizers/punkt_tab", "taggers/averaged_perceptron_tagger_eng"]
+NLTK_PACKAGES = ["punkt", "punkt_tab", "averaged_perceptron_tagger", "averaged_perceptron_tagger_eng",
+                 "brown", "wordnet", "movie_reviews"]
+
+def nltk_data_missing():
+    try:
+        for resource in NLTK_RESOURCES:
+            nltk.data.find(resource)
+    except LookupError:
+        return True
+    return False
+
+def download_nltk_data():
+    for package in NLTK_PACKAGES:
+        nltk.download(package)
+
+def ensure_nltk_data():
+    if nltk_data_missing():
+        download_nltk_data()
+
+def warm_up():
+    # Loads punkt, the perceptron tagger and the polarity table into this process,
+    # so the first analysis doesn't pay for them
+    nltk.pos_tag(nltk.word_tokenize("Warm up the tagger."))
+    return get_polarity_lookup()
+
+# ---------- Aspect extraction ----------
+NEGATIONS = ("no", "not", "n't", "never")
+MODIFIER_WINDOW = 2   # adverbs or negations kept from just before an opinion word
+
+def opinion_modifier(tagged, j):
+    # "not", "very", "not very"...: the adverbs and negations right before the
+    # adjective at j, which sentiment backends may use to adjust its polarity
+    words = []
+    for word, tag in reversed(tagged[max(0, j - MODIFIER_WINDOW):j]):
+        word = word.lower()
+        if tag[:2] != "RB" and word not in NEGATIONS:
+            break
+        words.append(word)
+    return " ".join(reversed(words))
+
+def pairs_from_tagged(tagged):
+    # (aspect, opinion, modifier) triples. Each tag's JJ prefix is checked once
+    # instead of once per neighbouring noun
+    is_adj = [tag[:2] == "JJ" for _, tag in tagged]
+    last = len(tagged) - 1
+    pairs = []
+    for i, (word, tag) in enumerate(tagged):
+        if tag[:2] != "NN":
+            continue
+        if i > 0 and is_adj[i-1]:
+            j = i - 1
+        elif i < last and is_adj[i+1]:
+            j = i + 1
+        else:
+            continue
+        pairs.append((word.lower(), tagged[j][0].lower(), opinion_modifier(tagged, j)))
+    return pairs
+
+# ---------- Tokenizer/tagger backends ----------
+# A backend turns review texts into Penn Treebank tagged tokens: tokenize(text)
+# and tag_sents(token_lists). Like sentiment backends they are picked by name,
+# and the name is part of the analysis cache key.
+TAGGER_BACKEND = "nltk"
+# Treebank-style tokens without punkt: contractions split as "do" "n't" / "it" "'s",
+# hyphenated and dotted words kept whole, punctuation on its own
+TOKEN_RE = re.compile(r"\w+(?=n't\b)|n't\b|'\w+|\w+(?:[-.]\w+)*|[^\w\s]")
+
+def _perceptron():
+    # The instance nltk.pos_tag uses (its cache is keyed by language), so both
+    # backends share one model in memory
+    get_tagger = getattr(nltk.tag, "_get_tagger", None)
+    return get_tagger("eng") if get_tagger else nltk.tag.PerceptronTagger()
+
+class NltkTagger:
+    # nltk.word_tokenize (punkt sentence splitting, then the Treebank regex
+    # cascade) and the averaged perceptron over every token. The default, and
+    # the reference the fast backend is measured against.
+    name = "nltk"
+    version = 1     # part of the analysis cache key for every backend but this one
+
+    def tokenize(self, text):
+        return nltk.word_tokenize(text)
+
+    def tag_sents(self, sentences):
+        return nltk.pos_tag_sents(sentences)
+
+class FastTagger:
+    # One regex pass instead of word_tokenize, then the same perceptron with its
+    # context features built only when needed: words in the tagger's own tagdict
+    # (its unambiguous training words) are looked up, and a review whose words
+    # all are is never scored. The lookup is fixed, so a review's tags are the
+    # perceptron's for its regex tokens whatever was analyzed before it, in any
+    # process; results differ from the nltk backend's only where the tokenizers
+    # split text differently, and benchmarks/run.py measures by how much.
+    name = "fast"
+    version = 2
+
+    def __init__(self):
+        self.tagger = _perceptron()
+        self.lookup = self.tagger.tagdict
+        self.lookups = self.predictions = 0
+
+    def tokenize(self, text):
+        return TOKEN_RE.findall(text)
+
+    def tag_sents(self, sentences):
+        return [self.tag(tokens) for tokens in sentences]
+
+    def tag(self, tokens):
+        # PerceptronTagger.tag with the context built lazily
+        tagger, lookup = self.tagger, self.lookup
+        prev, prev2 = tagger.START
+        context = None
+        tagged = []
+        for i, word in enumerate(tokens):
+            tag = lookup.get(word)
+            if tag is None:
+                if context is None:
+                    context = tagger.START + [tagger.normalize(w) for w in tokens] + tagger.END
+                tag, _ = tagger.model.predict(tagger._get_features(i, word, context, prev, prev2))
+            tagged.append((word, tag))
+            prev2, prev = prev, tag
+        if context is None:
+            self.lookups += 1
+        else:
+            self.predictions += 1
+        return tagged
+
+    def stats(self):
+        return {"lookup_size": len(self.lookup), "lookup_only_reviews": self.lookups,
+                "perceptron_reviews": self.predictions}
+
+TAGGER_BACKENDS = {backend.name: backend for backend in (NltkTagger, FastTagger)}
+
+@functools.lru_cache(maxsize=None)
+def get_tagger_backend(name=TAGGER_BACKEND):
+    if name not in TAGGER_BACKENDS:
+        raise ValueError(f"unknown tagger backend {name!r}; choose from {', '.join(TAGGER_BACKENDS)}")
+    backend = TAGGER_BACKENDS[name]()
+    if hasattr(backend, "stats"):
+        METRICS.add_collector(lambda: {f"tagger_{name}_{k}": v for k, v in backend.stats().items()})
+    return backend
+
+def extract_aspects_and_opinions(text, tagger=None):
+    backend = get_tagger_backend(tagger or TAGGER_BACKEND)
+    return pairs_from_tagged(backend.tag_sents([backend.tokenize(text)])[0])
+
+TAG_BATCH_SIZE = 256
+
+def extract_aspects_batch(texts, batch_size=TAG_BATCH_SIZE, tagger=None):
+    # One tag_sents call per chunk instead of one call per review; chunks stay
+    # small because holding a whole corpus of tagged sentences alive at once
+    # costs more in garbage collection than batching saves
+    backend = get_tagger_backend(tagger or TAGGER_BACKEND)
+    texts = list(texts)
+    for start in range(0, len(texts), batch_size):
+        batch = texts[start:start + batch_size]
+        with METRICS.timer("tokenize_review_seconds", len(batch)):
+            tokenized = [backend.tokenize(text) for text in batch]
+        with METRICS.timer("tag_review_seconds", len(batch)):
+            tagged_batch = backend.tag_sents(tokenized)
+        for tagged in tagged_batch:
+            yield pairs_from_tagged(tagged)
+
+# Part of every analysis cache key; bump it when extraction output changes.
+# Labels aren't cached, so switching sentiment backends keeps the cache valid;
+# tagger backends get keys of their own.
+EXTRACTOR_VERSION = 2
+ANALYZER_VERSION = f"pairs-{EXTRACTOR_VERSION}/nltk-{nltk.__version__}"
+
+def analysis_key(text, tagger=TAGGER_BACKEND):
+    if tagger != "nltk":
+        version = f"{ANALYZER_VERSION}/{tagger}-{TAGGER_BACKENDS[tagger].version}"
+    else:
+        version = ANALYZER_VERSION
+    return hashlib.sha1(f"{version}\x1f{text}".encode("utf-8")).hexdigest()[:20]
+
+SENTIMENT_THRESHOLD = 0.1
+
+def get_sentiment_label(score):
+    if score > SENTIMENT_THRESHOLD:
+        return "positive"
+    elif score < -SENTIMENT_THRESHOLD:
+        return "negative"
+    else:
+        return "neutral"
+
+# ---------- Polarity ----------
+POLARITY_TABLE_PATH = "polarity_table.json"
+POLARITY_CACHE_SIZE = 4096
+
+def build_polarity_table():
+    # TextBlob's own score for every word in its lexicon, so lookups stay exact
+    from textblob.en import sentiment as lexicon
+    return {word: TextBlob(word).sentiment.polarity for word in lexicon.keys()}
+
+def load_polarity_table(path):
+    try:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("textblob") == textblob.__version__:
+            return data["polarity"]
+    except (OSError, ValueError, KeyError):
+        pass
+    table = build_polarity_table()
+    try:
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"textblob": textblob.__version__, "polarity": table}, f)
+        os.replace(tmp, path)
+    except OSError:
+        pass
+    return table
+
+class PolarityLookup:
+    # Opinion polarity shared by every scoring call: the precomputed lexicon table
+    # first, then a bounded LRU of TextBlob scores for words outside it
+    def __init__(self, table_path=None, maxsize=POLARITY_CACHE_SIZE):
+        self.table = load_polarity_table(table_path) if table_path else {}
+        self.maxsize = maxsize
+        self.cache = OrderedDict()
+        self.lock = threading.Lock()
+        self.table_hits = self.cache_hits = self.misses = 0
+
+    def polarity(self, word):
+        score = self.table.get(word)
+        with self.lock:
+            if score is not None:
+                self.table_hits += 1
+                return score
+            score = self.cache.get(word)
+            if score is not None:
+                self.cache_hits += 1
+                self.cache.move_to_end(word)
+                return score
+            self.misses += 1
+        with METRICS.timer("polarity_textblob_seconds"):
+            score = TextBlob(word).sentiment.polarity
+        with self.lock:
+            self.cache[word] = score
+            if len(self.cache) > self.maxsize:
+                self.cache.popitem(last=False)
+        return score
+
+    def stats(self):
+        with self.lock:
+            return {"table_hits": self.table_hits, "cache_hits": self.cache_hits,
+                    "misses": self.misses, "table_size": len(self.table),
+                    "cache_size": len(self.cache)}
+
+@functools.lru_cache(maxsize=None)
+def get_polarity_lookup():
+    # One lookup per process, shared by every session and analysis
+    lookup = PolarityLookup(POLARITY_TABLE_PATH)
+    METRICS.add_collector(lambda: {f"polarity_{k}": v for k, v in lookup.stats().items()})
+    return lookup
+
+# ---------- Sentiment backends ----------
+# A backend labels a batch of an AspectTable's pairs at once: label_pairs(table,
+# first) returns int8 label codes for pairs first..end. Backends are picked by
+# name so analysis worker processes can build their own.
+SENTIMENT_BACKEND = "textblob"
+
+def label_codes(scores):
+    # get_sentiment_label over an array of scores
+    codes = np.full(len(scores), LABEL_CODES["neutral"], dtype=np.int8)
+    codes[scores > SENTIMENT_THRESHOLD] = LABEL_CODES["positive"]
+    codes[scores < -SENTIMENT_THRESHOLD] = LABEL_CODES["negative"]
+    return codes
+
+class TextBlobSentiment:
+    # Each opinion word's own TextBlob polarity, one pair at a time through the
+    # shared PolarityLookup; modifiers are ignored. The default, and the reference
+    # the other backends are measured against.
+    name = "textblob"
+
+    def __init__(self, polarity=None):
+        self.polarity = polarity or get_polarity_lookup()
+
+    def label_pairs(self, table, first=0):
+        opinions = table.opinions
+        return np.array([LABEL_CODES[get_sentiment_label(self.polarity.polarity(opinions[o]))]
+                         for o in table.pair_opinions[first:]], dtype=np.int8)
+
+class LexiconSentiment:
+    # TextBlob's lexicon as arrays: opinion and modifier vocabularies are scored
+    # once per distinct word, then every pair is labelled with NumPy lookups.
+    # Follows the lexicon's own phrase rules: an intensifier scales the opinion
+    # ("very good" = 0.7 * 1.3), a negation inverts that scaling and flips and
+    # halves the score ("not good" = -0.35). Words outside the lexicon score 0.
+    name = "lexicon"
+
+    def __init__(self, table_path=POLARITY_TABLE_PATH):
+        from textblob.en import sentiment as lexicon
+        self.polarity = load_polarity_table(table_path)
+        self.negations = set(NEGATIONS) | set(lexicon.negations)
+        # Adverbs the lexicon treats as modifiers, with their intensity
+        self.intensity = {word: entry["RB"][2] for word, entry in lexicon.items() if "RB" in entry}
+        self.lock = threading.Lock()
+        # Per-table scores for the vocabularies seen so far; tables only ever grow them
+        self.scored = weakref.WeakKeyDictionary()
+
+    def modifier_effect(self, modifier):
+        # (intensity, negated) for a modifier such as "not very"
+        words = modifier.split()
+        negated = any(w in self.negations for w in words)
+        intensity = 1.0
+        for w in words:
+            if w not in self.negations and w in self.intensity:
+                intensity = self.intensity[w]
+        return (1.0 / intensity if negated else intensity), negated
+
+    def vocabulary_scores(self, table):
+        with self.lock:
+            opinion_scores, intensities, negated = self.scored.get(table, (np.zeros(0), np.zeros(0), np.zeros(0, bool)))
+            if len(opinion_scores) < len(table.opinions):
+                new = [self.polarity.get(w, 0.0) for w in table.opinions[len(opinion_scores):]]
+                opinion_scores = np.concatenate([opinion_scores, new])
+            if len(intensities) < len(table.modifiers):
+                effects = [self.modifier_effect(m) for m in table.modifiers[len(intensities):]]
+                intensities = np.concatenate([intensities, [i for i, _ in effects]])
+                negated = np.concatenate([negated, np.array([n for _, n in effects], dtype=bool)])
+            self.scored[table] = opinion_scores, intensities, negated
+        return opinion_scores, intensities, negated
+
+    def scores(self, table, first=0):
+        opinion_scores, intensities, negated = self.vocabulary_scores(table)
+        opinions = np.frombuffer(table.pair_opinions, dtype=np.int32)[first:]
+        modifiers = np.frombuffer(table.pair_modifiers, dtype=np.int32)[first:]
+        scores = np.clip(opinion_scores[opinions] * intensities[modifiers], -1.0, 1.0)
+        return np.where(negated[modifiers], -0.5 * scores, scores)
+
+    def label_pairs(self, table, first=0):
+        return label_codes(self.scores(table, first))
+
+SENTIMENT_BACKENDS = {backend.name: backend for backend in (TextBlobSentiment, LexiconSentiment)}
+
+@functools.lru_cache(maxsize=None)
+def get_sentiment_backend(name=SENTIMENT_BACKEND):
+    # One instance per backend per process, like the polarity lookup
+    if name not in SENTIMENT_BACKENDS:
+        raise ValueError(f"unknown sentiment backend {name!r}; choose from {', '.join(SENTIMENT_BACKENDS)}")
+    return SENTIMENT_BACKENDS[name]()
+
+# ---------- Aggregation ----------
+SUMMARY_COLUMNS = ["Aspect", "Positive", "Neutral", "Negative", "Total", "Dominant"]
+LABELS = ["positive", "neutral", "negative"]
+LABEL_CODES = {label: code for code, label in enumerate(LABELS)}
+
+def summarize(aspects, counts):
+    # The summary table from an (n_aspects, 3) array of label counts
+    summary = pd.DataFrame({
+        "Aspect": list(aspects),
+        "Positive": counts[:, 0],
+        "Neutral": counts[:, 1],
+        "Negative": counts[:, 2],
+        "Total": counts.sum(axis=1),
+        # argmax keeps the first of tied labels, in LABELS order
+        "Dominant": np.array(LABELS, dtype=object)[counts.argmax(axis=1)],
+    }, columns=SUMMARY_COLUMNS)
+    return summary.sort_values("Total", ascending=False)
+
+def _intern(ids, names, value):
+    i = ids.get(value)
+    if i is None:
+        i = ids[value] = len(names)
+        names.append(value)
+    return i
+
+class ReviewPairs:
+    # One review's (aspect, opinion, label) pairs, decoded only when iterated
+    __slots__ = ("table", "start", "stop")
+
+    def __init__(self, table, start, stop):
+        self.table, self.start, self.stop = table, start, stop
+
+    def __len__(self):
+        return self.stop - self.start
+
+    def __iter__(self):
+        t = self.table
+        for i in range(self.start, self.stop):
+            yield t.aspects[t.pair_aspects[i]], t.opinions[t.pair_opinions[i]], LABELS[t.pair_labels[i]]
+
+    def __eq__(self, other):
+        return list(self) == list(other)
+
+    def __repr__(self):
+        return repr(list(self))
+
+class AspectTable:
+    # Columnar per-review pairs: interned aspect, opinion and modifier ids, int8
+    # label codes and CSR-style offsets, so review i owns pairs offsets[i]:offsets[i+1]
+    def __init__(self):
+        self.aspect_ids, self.aspects = {}, []
+        self.opinion_ids, self.opinions = {}, []
+        self.modifier_ids, self.modifiers = {"": 0}, [""]
+        self.pair_aspects = array("i")
+        self.pair_opinions = array("i")
+        self.pair_modifiers = array("i")
+        self.pair_labels = array("b")
+        self.offsets = array("q", [0])
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, review):
+        if review < 0:
+            review += len(self)
+        return ReviewPairs(self, self.offsets[review], self.offsets[review + 1])
+
+    def __iter__(self):
+        for review in range(len(self)):
+            yield self[review]
+
+    def append(self, pairs):
+        # Adds one review from (aspect, opinion, label code) triples
+        for aspect, opinion, code in pairs:
+            self.pair_aspects.append(_intern(self.aspect_ids, self.aspects, aspect))
+            self.pair_opinions.append(_intern(self.opinion_ids, self.opinions, opinion))
+            self.pair_modifiers.append(0)
+            self.pair_labels.append(code)
+        self.offsets.append(len(self.pair_labels))
+
+    def append_extracted(self, pairs):
+        # Adds one review from extracted (aspect, opinion, modifier) triples. Its
+        # labels are still missing: a sentiment backend appends them per batch
+        for aspect, opinion, modifier in pairs:
+            self.pair_aspects.append(_intern(self.aspect_ids, self.aspects, aspect))
+            self.pair_opinions.append(_intern(self.opinion_ids, self.opinions, opinion))
+            self.pair_modifiers.append(_intern(self.modifier_ids, self.modifiers, modifier))
+        self.offsets.append(len(self.pair_aspects))
+
+    def extend(self, other):
+        # Appends another table's reviews, remapping its ids into this table's vocabularies
+        for ids, names, col, other_names, other_col in (
+                (self.aspect_ids, self.aspects, self.pair_aspects, other.aspects, other.pair_aspects),
+                (self.opinion_ids, self.opinions, self.pair_opinions, other.opinions, other.pair_opinions),
+                (self.modifier_ids, self.modifiers, self.pair_modifiers, other.modifiers, other.pair_modifiers)):
+            remap = np.array([_intern(ids, names, v) for v in other_names], dtype=np.int32)
+            col.frombytes(remap[np.frombuffer(other_col, dtype=np.int32)].tobytes())
+        base = len(self.pair_labels)
+        self.pair_labels.extend(other.pair_labels)
+        self.offsets.frombytes((np.frombuffer(other.offsets, dtype=np.int64)[1:] + base).tobytes())
+
+class AspectAggregator:
+    # Running ABSA totals that can be fed reviews a page at a time. Pairs live in
+    # a columnar AspectTable; counts are only materialised, in one bincount
+    # pass, when a summary is asked for. With an AnalysisCache, only review
+    # texts it hasn't seen are tokenized and tagged, by the named tagger backend.
+    # Labels come from the named sentiment backend, one call per batch of reviews.
+    def __init__(self, polarity=None, cache=None, sentiment=None, tagger=None):
+        self.sentiment = TextBlobSentiment(polarity) if polarity else get_sentiment_backend(
+            sentiment or SENTIMENT_BACKEND)
+        self.tagger = tagger or TAGGER_BACKEND
+        self.cache = cache
+        self.aspect_table = AspectTable()
+
+    def add(self, texts):
+        texts = list(texts)
+        started = time.perf_counter()
+        table = self.aspect_table
+        first = len(table.pair_labels)
+        for pairs in self.extract(texts):
+            table.append_extracted(pairs)
+        with METRICS.timer("score_review_seconds", len(texts)):
+            table.pair_labels.frombytes(self.sentiment.label_pairs(table, first).tobytes())
+        if texts:
+            METRICS.observe("analyze_review_seconds", (time.perf_counter() - started) / len(texts), len(texts))
+
+    def extract(self, texts):
+        if self.cache is None:
+            return extract_aspects_batch(texts, tagger=self.tagger)
+        keys = [analysis_key(text, self.tagger) for text in texts]
+        found = self.cache.get_many(keys)
+        missing = {key: text for key, text in zip(keys, texts) if key not in found}
+        fresh = dict(zip(missing, extract_aspects_batch(missing.values(), tagger=self.tagger)))
+        self.cache.put_many(fresh.items())
+        found.update(fresh)
+        return (found[key] for key in keys)
+
+    def partial(self):
+        return self.aspect_table
+
+    def merge(self, aspect_table):
+        # Folds in a partial aggregate for the reviews that follow the ones seen so far
+        self.aspect_table.extend(aspect_table)
+
+    def counts(self):
+        # (n_aspects, 3) label counts from a single pass over the pairs
+        table = self.aspect_table
+        n = len(table.aspects)
+        codes = np.frombuffer(table.pair_aspects, dtype=np.int32).astype(np.int64) * len(LABELS)
+        codes += np.frombuffer(table.pair_labels, dtype=np.int8)
+        return np.bincount(codes, minlength=n * len(LABELS)).reshape(n, len(LABELS))
+
+    def summary(self):
+        return summarize(self.aspect_table.aspects, self.counts())
+
+class AspectCounts:
+    # Per-aspect label counts without the per-review pairs behind them: merging
+    # an AspectTable in and dropping it keeps memory proportional to the aspect
+    # vocabulary rather than to the number of reviews
+    def __init__(self):
+        self.aspect_ids, self.aspects = {}, []
+        self.counts = np.zeros((0, len(LABELS)), dtype=np.int64)
+
+    def merge(self, table):
+        remap = np.array([_intern(self.aspect_ids, self.aspects, a) for a in table.aspects], dtype=np.int64)
+        if len(self.aspects) > len(self.counts):
+            grown = np.zeros((max(len(self.aspects), 2 * len(self.counts)), len(LABELS)), dtype=np.int64)
+            grown[:len(self.counts)] = self.counts
+            self.counts = grown
+        codes = remap[np.frombuffer(table.pair_aspects, dtype=np.int32)] * len(LABELS)
+        codes += np.frombuffer(table.pair_labels, dtype=np.int8)
+        added = np.bincount(codes, minlength=len(self.aspects) * len(LABELS))
+        self.counts[:len(self.aspects)] += added.reshape(-1, len(LABELS))
+
+    def summary(self):
+        return summarize(self.aspects, self.counts[:len(self.aspects)])
+
+# ---------- Parallel analysis ----------
+ANALYSIS_WORKERS = os.cpu_count() or 1   # processes in the shared pool
+ANALYSIS_CHUNK_SIZE = 500     # reviews per worker task; smaller corpora stay in-process
+ANALYSIS_MP_CONTEXT = "spawn"  # forking a threaded Streamlit server is unsafe
+
+def _init_worker():
+    # Load the NLP models once per worker, not once per chunk
+    warm_up()
+
+@functools.lru_cache(maxsize=None)
+def _worker_cache(path, max_entries):
+    return AnalysisCache(path, max_entries)
+
+def _analyze_chunk(texts, cache_args=None, sentiment=None, tagger=None):
+    # Workers open the parent's analysis cache file and build the parent's backends themselves
+    aggregator = AspectAggregator(cache=_worker_cache(*cache_args) if cache_args else None,
+                                  sentiment=sentiment, tagger=tagger)
+    aggregator.add(texts)
+    # This process's metrics travel back with the result, to be merged by the parent
+    return aggregator.partial(), METRICS.drain()
+
+_analysis_pool = None
+_analysis_pool_lock = threading.Lock()
+
+def get_analysis_pool(broken=None):
+    # One pool per process, started on first use and kept warm: its workers load
+    # the models once and then serve every analysis, including concurrent ones.
+    # Created under a lock, since two jobs reaching their first chunk together
+    # would otherwise each start one. Pass a pool found broken to replace it;
+    # it is replaced once however many analyzers report it.
+    global _analysis_pool
+    with _analysis_pool_lock:
+        if _analysis_pool is None or _analysis_pool is broken:
+            _analysis_pool = ProcessPoolExecutor(
+                max_workers=ANALYSIS_WORKERS,
+                mp_context=multiprocessing.get_context(ANALYSIS_MP_CONTEXT),
+                initializer=_init_worker)
+        return _analysis_pool
+
+class ParallelAnalyzer:
+    # Shards reviews into chunks across the shared process pool and merges the
+    # partial aggregates back in submission order, so results match a serial run.
+    # At most `workers` chunks are in flight per analyzer, so analyses running at
+    # the same time take turns on the pool instead of one queueing all its chunks.
+    def __init__(self, aggregator, workers=ANALYSIS_WORKERS, chunk_size=ANALYSIS_CHUNK_SIZE):
+        self.aggregator = aggregator
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.buffer = []
+        self.pending = deque()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.finish()
+        self.close()
+
+    def add(self, texts):
+        if self.workers <= 1:
+            self.aggregator.add(texts)
+            return
+        self.buffer.extend(texts)
+        while len(self.buffer) >= self.chunk_size:
+            chunk = self.buffer[:self.chunk_size]
+            self.buffer = self.buffer[self.chunk_size:]
+            self._submit(chunk)
+        self._collect(block=False)
+
+    def finish(self):
+        # The pool is only started once a full chunk exists; a short tail runs here
+        self._collect(block=True)
+        if self.buffer:
+            self.aggregator.add(self.buffer)
+            self.buffer = []
+
+    def close(self):
+        # The pool stays up for the next analysis; only this analyzer's queued chunks go
+        while self.pending:
+            self.pending.popleft().cancel()
+
+    def _submit(self, chunk):
+        if len(self.pending) >= self.workers:
+            self._collect_one()
+        cache = self.aggregator.cache
+        cache_args = (cache.path, cache.max_entries) if cache else None
+        args = (_analyze_chunk, chunk, cache_args, self.aggregator.sentiment.name, self.aggregator.tagger)
+        pool = get_analysis_pool()
+        try:
+            future = pool.submit(*args)
+        except BrokenProcessPool:
+            # A worker died and took the pool with it; start a fresh one
+            future = get_analysis_pool(broken=pool).submit(*args)
+        self.pending.append(future)
+
+    def _collect(self, block):
+        while self.pending and (block or self.pending[0].done()):
+            self._collect_one()
+
+    def _collect_one(self):
+        table, metrics = self.pending.popleft().result()
+        METRICS.merge(metrics)
+        self.aggregator.merge(table)
+
+def analyze_aspects(df, workers=ANALYSIS_WORKERS, chunk_size=ANALYSIS_CHUNK_SIZE, cache=None, sentiment=None,
+                    tagger=None):
+    aggregator = AspectAggregator(cache=cache, sentiment=sentiment, tagger=tagger)
+    with ParallelAnalyzer(aggregator, workers, chunk_size) as analyzer:
+        analyzer.add(df["review"].tolist())
+    return aggregator.summary(), aggregator.aspect_table
@@ -0,0 +1,95 @@
+import json
+import time
+import sqlite3
+import threading
+from contextlib import closing
+
+from metrics import METRICS
+
+ANALYSIS_CACHE_SIZE = 500_000   # reviews kept before the least recently used are evicted
+SQL_BATCH = 500                 # keys per IN (...) query, under SQLite's variable limit
+
+class AnalysisCache:
+    # SQLite-backed cache of each review's extracted (aspect, opinion, modifier)
+    # triples, keyed by absa.analysis_key (a hash of the text, extractor version
+    # and tagger backend). Labels aren't stored; sentiment backends add them.
+    def __init__(self, path="analysis_cache.db", max_entries=ANALYSIS_CACHE_SIZE):
+        self.path = path
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.hits = self.misses = self.evictions = 0
+        with closing(self._connect()) as conn, conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS analysis (
+                    key TEXT PRIMARY KEY,
+                    pairs TEXT NOT NULL,
+                    used_at REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS analysis_used_at ON analysis (used_at)")
+            self.size = conn.execute("SELECT COUNT(*) FROM analysis").fetchone()[0]
+
+    def _connect(self):
+        # One short-lived connection per call, like ReviewStore; analysis workers open their own
+        return sqlite3.connect(self.path, timeout=30)
+
+    def get_many(self, keys):
+        # {key: [(aspect, opinion), ...]} for the keys that are cached; hits are marked as used
+        keys = list(dict.fromkeys(keys))
+        found = {}
+        with closing(self._connect()) as conn, conn:
+            for start in range(0, len(keys), SQL_BATCH):
+                batch = keys[start:start + SQL_BATCH]
+                rows = conn.execute(
+                    f"SELECT key, pairs FROM analysis WHERE key IN ({', '.join('?' * len(batch))})", batch)
+                for key, pairs in rows:
+                    found[key] = [tuple(p) for p in json.loads(pairs)]
+            if found:
+                now = time.time()
+                conn.executemany("UPDATE analysis SET used_at = ? WHERE key = ?",
+                                 ((now, key) for key in found))
+        with self.lock:
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        METRICS.inc("analysis_cache_hits_total", len(found))
+        METRICS.inc("analysis_cache_misses_total", len(keys) - len(found))
+        return found
+
+    def put_many(self, items):
+        # `items` is (key, pairs) for freshly analyzed reviews
+        now = time.time()
+        rows = [(key, json.dumps(pairs, separators=(",", ":")), now) for key, pairs in items]
+        if not rows:
+            return
+        with closing(self._connect()) as conn, conn:
+            added = conn.executemany("INSERT OR IGNORE INTO analysis VALUES (?, ?, ?)", rows).rowcount
+            with self.lock:
+                self.size += added
+                over = self.size > self.max_entries
+            if over:
+                self._evict(conn)
+
+    def _evict(self, conn):
+        # Other processes share the file, so recount before trimming; a 10% margin
+        # keeps eviction from running on every insert once the cache is full
+        size = conn.execute("SELECT COUNT(*) FROM analysis").fetchone()[0]
+        excess = size - int(self.max_entries * 0.9)
+        if size > self.max_entries and excess > 0:
+            conn.execute("DELETE FROM analysis WHERE key IN "
+                         "(SELECT key FROM analysis ORDER BY used_at ASC LIMIT ?)", (excess,))
+            with self.lock:
+                self.evictions += excess
+            size -= excess
+        with self.lock:
+            self.size = size
+
+    def stats(self):
+        with self.lock:
+            return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                    "size": self.size, "max_entries": self.max_entries}
+
+    def clear(self):
+        with closing(self._connect()) as conn, conn:
+            conn.execute("DELETE FROM analysis")
+        with self.lock:
+            self.size = 0
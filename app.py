@@ -1,13 +1,16 @@
-import streamlit as st
-import requests
-from bs4 import BeautifulSoup
-import pandas as pd
-import matplotlib.pyplot as plt
-from collections import defaultdict
-from textblob import TextBlob
-import nltk
 import time
-import random
+import streamlit as st
+
+# pandas, matplotlib, NLTK and TextBlob are imported in the blocks that need them,
+# so a cold start or a rerun that only renders the form doesn't pay for them
+
+REVIEW_STORE_PATH = "reviews.db"
+ANALYSIS_CACHE_PATH = "analysis_cache.db"
+ESTIMATE_PAGE_BUDGET = 10    # fast estimate defaults; 0 means no limit
+ESTIMATE_TIME_BUDGET = 20
+SCRAPE_DEADLINE = 300        # seconds before a full scrape stops and analyzes what it has
+JOB_POLL_SECONDS = 0.5       # how often the progress card checks on its background job
+METRICS_PORT = None          # set to a port to serve Prometheus metrics at /metrics
 
 # -------------------------------
 # Must be FIRST Streamlit call
@@ -448,99 +451,111 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # ---------- NLTK setup ----------
-def ensure_nltk_data():
+@st.cache_resource(show_spinner="🔄 Setting up NLP data...")
+def load_nlp_resources():
+    # Once per server process, shared by every session and rerun: NLTK data,
+    # a warmed-up tokenizer and tagger, and the polarity lookup
+    from absa import ensure_nltk_data, warm_up
+    ensure_nltk_data()
     try:
-        nltk.data.find('tokenizers/punkt')
-        nltk.data.find('tokenizers/punkt_tab')
-        nltk.data.find('taggers/averaged_perceptron_tagger_eng')
+        return warm_up()
     except LookupError:
-        with st.spinner("🔄 Setting up NLP data..."):
-            nltk.download('punkt')
-            nltk.download('punkt_tab')
-            nltk.download('averaged_perceptron_tagger')
-            nltk.download('averaged_perceptron_tagger_eng')
-            nltk.download('brown')
-            nltk.download('wordnet')
-            nltk.download('movie_reviews')
-
-ensure_nltk_data()
-
-# ---------- NLP helpers ----------
-def extract_aspects_and_opinions(text):
-    tokens = nltk.word_tokenize(text)
-    tagged = nltk.pos_tag(tokens)
-    pairs = []
-    for i, (word, tag) in enumerate(tagged):
-        if tag.startswith("NN"):
-            left_adj = tagged[i-1][0] if i > 0 and tagged[i-1][1].startswith("JJ") else None
-            right_adj = tagged[i+1][0] if i < len(tagged)-1 and tagged[i+1][1].startswith("JJ") else None
-            opinion = left_adj or right_adj
-            if opinion:
-                pairs.append((word.lower(), opinion.lower()))
-    return pairs
-
-def get_sentiment_label(score):
-    if score > 0.1:
-        return "positive"
-    elif score < -0.1:
-        return "negative"
-    else:
-        return "neutral"
-
-def analyze_aspects(df):
-    aspect_sentiments = defaultdict(list)
-    aspect_table = []
-
-    for _, row in df.iterrows():
-        pairs = extract_aspects_and_opinions(row["review"])
-        pair_list = []
-        for aspect, opinion in pairs:
-            blob = TextBlob(opinion)
-            s = blob.sentiment.polarity
-            label = get_sentiment_label(s)
-            aspect_sentiments[aspect].append(label)
-            pair_list.append((aspect, opinion, label))
-        aspect_table.append(pair_list)
-
-    summary = []
-    for a, sents in aspect_sentiments.items():
-        pos, neu, neg = sents.count("positive"), sents.count("neutral"), sents.count("negative")
-        total = pos + neu + neg
-        dom = max(["positive", "neutral", "negative"], key=lambda x: sents.count(x))
-        summary.append({"Aspect": a, "Positive": pos, "Neutral": neu, "Negative": neg, "Total": total, "Dominant": dom})
-    return pd.DataFrame(summary).sort_values("Total", ascending=False), aspect_table
-
-# ---------- Scraper ----------
-def scrape_trustpilot(domain):
-    base = f"https://www.trustpilot.com/review/{domain.strip()}"
-    all_reviews, page = [], 1
-    progress = st.empty()
-
-    while True:
-        url = f"{base}?page={page}"
-        response = requests.get(url, headers={"User-Agent": "Mozilla/5.0"})
-        if response.status_code != 200:
-            break
-        soup = BeautifulSoup(response.text, "html.parser")
-        sections = soup.find_all("section", class_="styles_reviewContentwrapper__K2aRu")
-        if not sections:
-            break
-
-        for s in sections:
-            title = s.find("h2").get_text(strip=True) if s.find("h2") else ""
-            rev = s.find("p").get_text(strip=True) if s.find("p") else ""
-            date = s.find("div", {"data-testid": "review-badge-date"})
-            date = date.get_text(strip=True) if date else ""
-            rating_div = s.find("div", {"data-service-review-rating": True})
-            rating = rating_div["data-service-review-rating"] if rating_div else ""
-            if rev:
-                all_reviews.append({"rating": rating, "title": title, "review": rev, "date": date})
-        progress.info(f"📄 Scraped page {page} ({len(all_reviews)} total)")
-        page += 1
-        time.sleep(1.2)
-
-    progress.empty()
-    return pd.DataFrame(all_reviews)
+        # Data could not be downloaded; analysis will report the missing resource
+        return None
+
+# ---------- Background analysis jobs ----------
+@st.cache_resource
+def job_manager():
+    # One per server process: every session submits here, so concurrent requests
+    # for the same domain share a single scrape and analysis, and all jobs share
+    # one request rate to Trustpilot
+    from jobs import JobManager
+    from metrics import serve_metrics
+    if METRICS_PORT:
+        serve_metrics(METRICS_PORT)
+    return JobManager()
+
+# ---------- Cached result views ----------
+CHART_MAX_WIDTH = 1460  # Streamlit downscales wider images on every render
+
+def render_png(fig):
+    # Same rasterisation st.pyplot uses, done once and already at display width
+    import io
+    import matplotlib.pyplot as plt
+    from PIL import Image
+    from metrics import METRICS
+    with METRICS.timer("render_chart_seconds"):
+        buf = io.BytesIO()
+        fig.savefig(buf, format="png", dpi=200, bbox_inches="tight")
+        plt.close(fig)
+        image = Image.open(buf)
+        if image.width <= CHART_MAX_WIDTH:
+            return buf.getvalue()
+        height = int(image.height * CHART_MAX_WIDTH / image.width)
+        out = io.BytesIO()
+        image.resize((CHART_MAX_WIDTH, height), resample=Image.BILINEAR).save(out, format="PNG")
+        return out.getvalue()
+
+def render_aspect_chart(top):
+    import matplotlib.pyplot as plt
+    fig, ax = plt.subplots(figsize=(12, 8))  # Larger figure for wider layout
+    fig.patch.set_facecolor('#0d1117')
+    ax.set_facecolor('#0d1117')
+
+    aspects = top['Aspect']
+    pos = top['Positive']
+    neu = top['Neutral']
+    neg = top['Negative']
+
+    ax.barh(aspects, pos, label='Positive', color='#3fb950')
+    ax.barh(aspects, neu, left=pos, label='Neutral', color='#d29922')
+    ax.barh(aspects, neg, left=pos+neu, label='Negative', color='#f85149')
+
+    ax.set_xlabel('Count', color='#f0f6fc', fontsize=12)
+    ax.set_ylabel('Aspects', color='#f0f6fc', fontsize=12)
+    ax.tick_params(colors='#8b949e', labelsize=10)
+    ax.legend(facecolor='#161b22', edgecolor='#30363d', labelcolor='#f0f6fc', fontsize=10)
+    ax.spines['bottom'].set_color('#30363d')
+    ax.spines['top'].set_color('#30363d')
+    ax.spines['right'].set_color('#30363d')
+    ax.spines['left'].set_color('#30363d')
+
+    fig.tight_layout()
+    return render_png(fig)
+
+def render_sentiment_pie(sizes):
+    import matplotlib.pyplot as plt
+    fig, ax = plt.subplots(figsize=(8, 8))
+    fig.patch.set_facecolor('#0d1117')
+    ax.set_facecolor('#0d1117')
+
+    labels = ["Positive", "Neutral", "Negative"]
+    colors = ['#3fb950', '#d29922', '#f85149']
+
+    wedges, texts, autotexts = ax.pie(
+        sizes, labels=labels, autopct="%1.1f%%", startangle=90,
+        colors=colors, textprops={'color': '#f0f6fc', 'fontsize': 11}
+    )
+
+    plt.setp(autotexts, size=11, weight="bold", color='#0d1117')
+    return render_png(fig)
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def result_views(analysis_id, _df, _aspect_df):
+    # Everything the results page derives from an analysis, keyed by the analysis id,
+    # so reruns that don't change the analysis do no plotting or pandas work
+    import pandas as pd
+    avg_rating = pd.to_numeric(_df['rating'], errors='coerce').mean()
+    totals = tuple(int(_aspect_df[c].sum()) for c in ("Positive", "Neutral", "Negative"))
+    top = _aspect_df.head(10)
+    return {
+        "n_reviews": len(_df),
+        "avg_rating": None if pd.isna(avg_rating) else float(avg_rating),
+        "n_aspects": len(_aspect_df),
+        "totals": totals,
+        "aspect_chart": render_aspect_chart(top),
+        "sentiment_pie": render_sentiment_pie(list(totals)),
+    }
 
 # ---------- Modern UI Layout ----------
 
@@ -584,6 +599,24 @@ with col2:
     st.markdown("<br>", unsafe_allow_html=True)
     analyze_clicked = st.button("🚀 **Start Analysis**", use_container_width=True)
 
+opt1, opt2, opt3 = st.columns([2, 1, 1])
+with opt1:
+    fast_estimate = st.toggle(
+        "⚡ **Fast estimate**",
+        help="Sample pages in stratified random order and report the sentiment score with a "
+             "95% confidence interval that narrows as pages arrive")
+    diagnostics = st.toggle("🩺 **Diagnostics**",
+                            help="Show per-stage timings, counters and cache hit rates, with JSON and "
+                                 "Prometheus exports")
+    profile_run = st.checkbox("Profile the next run with cProfile", disabled=not diagnostics,
+                              help="Slows the run down; the report appears under Diagnostics")
+with opt2:
+    page_budget = st.number_input("Page budget", min_value=0, value=ESTIMATE_PAGE_BUDGET, step=5,
+                                  help="Pages to sample (0 = no limit)", disabled=not fast_estimate)
+with opt3:
+    time_budget = st.number_input("Time budget (s)", min_value=0, value=ESTIMATE_TIME_BUDGET, step=5,
+                                  help="Seconds to sample for (0 = no limit)", disabled=not fast_estimate)
+
 st.markdown("""
 <small class="text-muted-modern">
     <i class="bi bi-info-circle me-1"></i>Enter the domain name as it appears on Trustpilot (e.g., 'www.facebook.com')
@@ -598,74 +631,139 @@ if 'analysis_complete' not in st.session_state:
 if 'show_progress' not in st.session_state:
     st.session_state.show_progress = False
 
+def release_job():
+    # This session stops watching its job, at most once per job
+    job = st.session_state.get("job")
+    if job is not None and not st.session_state.get("job_detached", True):
+        st.session_state.job_detached = True
+        return job.detach()
+    return False
+
+def stop_job(job):
+    # Stop/Accept cancels the job only if no other session is watching it; otherwise
+    # this session leaves and the others keep their full analysis
+    if not release_job():
+        st.session_state.left_job = True
+
 # Analysis Section
 if analyze_clicked and not st.session_state.analysis_complete:
+    from analysis_cache import AnalysisCache
+    from review_store import ReviewStore
+    from jobs import analysis_job, job_key
+    load_nlp_resources()
+    budget = (page_budget, time_budget) if fast_estimate else None
+    profile = diagnostics and profile_run
+    # A session asking for a domain that's already being analyzed joins that job
+    release_job()
+    st.session_state.job_detached = st.session_state.left_job = False
+    st.session_state.job = job_manager().submit(
+        job_key(domain, budget, profile), analysis_job, domain, budget=budget,
+        store=ReviewStore(REVIEW_STORE_PATH), cache=AnalysisCache(ANALYSIS_CACHE_PATH),
+        timeout=SCRAPE_DEADLINE, profile=profile, limiter=job_manager().limiter)
+    st.session_state.estimate_budget = budget
     st.session_state.show_progress = True
     st.session_state.analysis_complete = False
+    st.session_state.estimate = None
+
+@st.fragment(run_every=JOB_POLL_SECONDS)
+def job_progress(job, budget):
+    # Only this fragment reruns while the job works on a server thread, so the
+    # page stays responsive; once the job is done the whole script reruns
+    snapshot = job.snapshot()
+    if job.finished or st.session_state.get("left_job"):
+        st.rerun()
+
+    pages, reviews = snapshot["progress"]["scrape"], snapshot["progress"]["analyze"]
+    # Scraping fills the first half of the bar and analysis the second;
+    # while the last page is unknown, creep towards (but never reach) half
+    scraped = pages.done / pages.total if pages.total else pages.done / (pages.done + 1)
+    analyzed = reviews.done / reviews.total if reviews.total else 0
+    st.progress(min(int(50 * scraped * (1 + analyzed)), 100))
+
+    live = snapshot["live"] or {}
+    estimate = live.get("estimate")
+    if snapshot["status"] == "queued":
+        st.text("⏳ Waiting for a free analysis worker...")
+    elif estimate and estimate["score"].value is not None:
+        score = estimate["score"]
+        st.text(f"⚡ Sentiment score ≈ {score.value:.3f} (95% CI {score.low:.3f} to {score.high:.3f}) "
+                f"from {estimate['pages']}/{estimate['total_pages'] or '?'} pages")
+    elif pages.done:
+        of_pages = f"/{pages.total}" if pages.total else ""
+        st.text(f"📄 Fetched {pages.done}{of_pages} pages · 🔍 Analyzed {reviews.done}/{reviews.total} reviews")
+    else:
+        st.text("🌐 Connecting to Trustpilot...")
+    if snapshot["watchers"] > 1:
+        st.caption(f"👥 Shared with {snapshot['watchers'] - 1} other session(s) analyzing this domain")
+    if live.get("table") is not None:
+        st.dataframe(live["table"], use_container_width=True)
+
+    # The last watcher stopping ends the job; it still analyzes what it has, so the
+    # result arrives as usual
+    stop_label = "✅ **Accept estimate**" if budget else "⏹️ **Stop and analyze what's scraped**"
+    if snapshot["watchers"] > 1:
+        stop_label = "⏹️ **Stop watching** (the others keep this analysis running)"
+    st.button(stop_label, on_click=stop_job, args=(job,), disabled=snapshot["cancelled"])
 
 # Show progress section if analysis is in progress
 if st.session_state.show_progress:
-    with st.container():
-        st.markdown("""
-        <div class="modern-card">
-            <div class="card-header">
-                <h2 class="card-title">
-                    <i class="bi bi-graph-up"></i>
-                    Analysis Progress
-                </h2>
-            </div>
-            <div class="card-body">
-        """, unsafe_allow_html=True)
-        
-        progress_bar = st.progress(0)
-        status_text = st.empty()
-        
-        # Simulate progress updates
-        for percent_complete in range(0, 101, 10):
-            if percent_complete == 0:
-                status_text.text("🔄 Starting analysis...")
-            elif percent_complete == 10:
-                status_text.text("🌐 Connecting to Trustpilot...")
-            elif percent_complete == 20:
-                status_text.text("📄 Scraping reviews...")
-            elif percent_complete == 40:
-                # Actual scraping happens here
-                with st.spinner(f"🔍 **Scraping reviews from {domain}...**"):
-                    df = scrape_trustpilot(domain)
-                status_text.text("🔍 Analyzing aspects and sentiment...")
-            elif percent_complete == 70:
-                # Actual analysis happens here
-                if not df.empty:
-                    with st.spinner("🔍 **Analyzing aspects and sentiments...**"):
-                        aspect_df, aspect_table = analyze_aspects(df)
-                status_text.text("📊 Generating visualizations...")
-            elif percent_complete == 90:
-                status_text.text("🎨 Finalizing results...")
-            elif percent_complete == 100:
-                status_text.text("✅ Analysis complete!")
-            
-            progress_bar.progress(percent_complete)
-            time.sleep(0.3)  # Reduced sleep time for faster progress
-
-        st.markdown("</div></div>", unsafe_allow_html=True)
+    job = st.session_state.job
+    if job.finished:
+        release_job()
+    if st.session_state.get("left_job"):
+        st.session_state.left_job = False
+        st.session_state.show_progress = False
+        st.info("⏹️ **Stopped watching** — the analysis keeps running for the other sessions that asked for "
+                "this domain. Start it again to rejoin.")
+
+    elif not job.finished:
+        with st.container():
+            st.markdown("""
+            <div class="modern-card">
+                <div class="card-header">
+                    <h2 class="card-title">
+                        <i class="bi bi-graph-up"></i>
+                        Analysis Progress
+                    </h2>
+                </div>
+                <div class="card-body">
+            """, unsafe_allow_html=True)
+            job_progress(job, st.session_state.get("estimate_budget"))
+            st.markdown("</div></div>", unsafe_allow_html=True)
+
+    elif job.error is not None:
+        st.error(f"⚠️ **Analysis failed:** {job.error}")
+        st.session_state.show_progress = False
 
-    # Store results in session state
-    if not df.empty:
+    elif not job.result[0].empty:
+        # Store results in session state
+        df, aspect_df, aspect_table, estimate, aspect_index = job.result
+        scrape_stats = job.stats
         st.session_state.df = df
         st.session_state.aspect_df = aspect_df
         st.session_state.aspect_table = aspect_table
+        st.session_state.aspect_index = aspect_index
+        # Sessions that shared the job also share its cached charts
+        st.session_state.analysis_id = job.id
         
         # Calculate sentiment score
         pos, neu, neg = aspect_df["Positive"].sum(), aspect_df["Neutral"].sum(), aspect_df["Negative"].sum()
         total = pos + neu + neg
         sentiment_score = (pos - neg) / total if total else 0
         st.session_state.sentiment_score = sentiment_score
+        st.session_state.estimate = None if estimate is None or estimate["complete"] else estimate
+        st.session_state.stop_reason = scrape_stats.get("stop_reason") if scrape_stats.get("partial") else None
+        st.session_state.resume_page = scrape_stats.get("resume_page")
         
         st.session_state.show_progress = False
         st.session_state.analysis_complete = True
         
         # Use rerun to refresh the page and show results
         st.rerun()
+    elif job.cancel.is_set():
+        # Stopped before the first page arrived: nothing to show
+        st.session_state.show_progress = False
+        st.rerun()
     else:
         st.error("""
         ⚠️ **No reviews found!** 
@@ -680,21 +778,42 @@ if st.session_state.analysis_complete and 'aspect_df' in st.session_state:
     df = st.session_state.df
     aspect_df = st.session_state.aspect_df
     aspect_table = st.session_state.aspect_table
+    aspect_index = st.session_state.aspect_index
     sentiment_score = st.session_state.sentiment_score
+    views = result_views(st.session_state.analysis_id, df, aspect_df)
 
     # Success Alert
-    st.success(f"✅ **Successfully collected {len(df)} reviews from {domain}**")
+    st.success(f"✅ **Successfully collected {views['n_reviews']} reviews from {domain}**")
+
+    stop_reason = st.session_state.get("stop_reason")
+    if stop_reason:
+        reason = {"cancelled": "you stopped it", "deadline": f"it hit the {SCRAPE_DEADLINE}s deadline"}.get(
+            stop_reason, stop_reason)
+        st.warning(f"⚠️ **Partial results** — scraping ended early because {reason}; "
+                   f"everything below covers the {views['n_reviews']} reviews gathered before that."
+                   + (f" They are saved, and the next analysis continues the crawl from page "
+                      f"{st.session_state.resume_page}." if st.session_state.get("resume_page") else ""))
+
+    # Sampled runs say how far the numbers below can be trusted
+    estimate = st.session_state.get("estimate")
+    if estimate and estimate["score"].value is not None:
+        score = estimate["score"]
+        st.info(f"⚡ **Fast estimate** from {estimate['pages']} of {estimate['total_pages'] or '?'} pages: "
+                f"sentiment score {score.value:.3f} (95% CI {score.low:.3f} to {score.high:.3f}). "
+                "Turn off Fast estimate for the full analysis.")
+        with st.expander("📐 **Estimated aspect shares (95% CI)**", expanded=False):
+            st.dataframe(estimate["aspects"], use_container_width=True)
     
     # Metrics Cards - Calculate once and display
     col1, col2, col3, col4 = st.columns(4)
     
     with col1:
-        st.metric("Total Reviews", len(df))
+        st.metric("Total Reviews", views["n_reviews"])
     with col2:
-        avg_rating = pd.to_numeric(df['rating'], errors='coerce').mean()
-        st.metric("Average Rating", f"{avg_rating:.1f} ⭐" if not pd.isna(avg_rating) else "N/A")
+        avg_rating = views["avg_rating"]
+        st.metric("Average Rating", f"{avg_rating:.1f} ⭐" if avg_rating is not None else "N/A")
     with col3:
-        st.metric("Aspects Found", len(aspect_df))
+        st.metric("Aspects Found", views["n_aspects"])
     with col4:
         st.metric("Sentiment Score", f"{sentiment_score:.3f}")
 
@@ -711,30 +830,7 @@ if st.session_state.analysis_complete and 'aspect_df' in st.session_state:
         """, unsafe_allow_html=True)
         
         # Sentiment Distribution Bar Chart
-        fig, ax = plt.subplots(figsize=(12, 8))  # Larger figure for wider layout
-        fig.patch.set_facecolor('#0d1117')
-        ax.set_facecolor('#0d1117')
-        
-        aspects = aspect_df.head(10)['Aspect']
-        pos = aspect_df.head(10)['Positive']
-        neu = aspect_df.head(10)['Neutral']
-        neg = aspect_df.head(10)['Negative']
-        
-        ax.barh(aspects, pos, label='Positive', color='#3fb950')
-        ax.barh(aspects, neu, left=pos, label='Neutral', color='#d29922')
-        ax.barh(aspects, neg, left=pos+neu, label='Negative', color='#f85149')
-        
-        ax.set_xlabel('Count', color='#f0f6fc', fontsize=12)
-        ax.set_ylabel('Aspects', color='#f0f6fc', fontsize=12)
-        ax.tick_params(colors='#8b949e', labelsize=10)
-        ax.legend(facecolor='#161b22', edgecolor='#30363d', labelcolor='#f0f6fc', fontsize=10)
-        ax.spines['bottom'].set_color('#30363d')
-        ax.spines['top'].set_color('#30363d')
-        ax.spines['right'].set_color('#30363d')
-        ax.spines['left'].set_color('#30363d')
-        
-        plt.tight_layout()
-        st.pyplot(fig, use_container_width=True)  # Use container width
+        st.image(views["aspect_chart"], use_column_width=True, output_format="PNG")
         st.markdown("</div>", unsafe_allow_html=True)
 
     with col2:
@@ -747,21 +843,7 @@ if st.session_state.analysis_complete and 'aspect_df' in st.session_state:
         """, unsafe_allow_html=True)
         
         # Overall Sentiment Pie Chart
-        fig, ax = plt.subplots(figsize=(8, 8))
-        fig.patch.set_facecolor('#0d1117')
-        ax.set_facecolor('#0d1117')
-        
-        labels = ["Positive", "Neutral", "Negative"]
-        sizes = [aspect_df["Positive"].sum(), aspect_df["Neutral"].sum(), aspect_df["Negative"].sum()]
-        colors = ['#3fb950', '#d29922', '#f85149']
-        
-        wedges, texts, autotexts = ax.pie(
-            sizes, labels=labels, autopct="%1.1f%%", startangle=90,
-            colors=colors, textprops={'color': '#f0f6fc', 'fontsize': 11}
-        )
-        
-        plt.setp(autotexts, size=11, weight="bold", color='#0d1117')
-        st.pyplot(fig, use_container_width=True)
+        st.image(views["sentiment_pie"], use_column_width=True, output_format="PNG")
         st.markdown("</div>", unsafe_allow_html=True)
 
     # Aspect Details Table (Collapsible)
@@ -788,57 +870,87 @@ if st.session_state.analysis_complete and 'aspect_df' in st.session_state:
         <div class="card-body">
     """, unsafe_allow_html=True)
 
-    num_reviews = st.slider(
-        "**Select number of reviews to analyze:**", 
-        1, min(10, len(df)), 5, key="review_slider"
-    )
-    
-    selected_indices = random.sample(range(len(df)), num_reviews)
-
-    for idx in selected_indices:
-        row = df.iloc[idx]
+    # Only this section reruns when a filter or the page changes
+    @st.fragment
+    def review_cards(df, aspect_table, index):
+        from absa import LABELS
+        from aspect_index import DRILL_PAGE_SIZE, MATCH_MODES
+
+        col1, col2, col3, col4 = st.columns([3, 3, 2, 2])
+        with col1:
+            aspect = st.text_input("**Aspect**", key="drill_aspect", placeholder="e.g. refund")
+        with col2:
+            opinion = st.text_input("**Opinion**", key="drill_opinion", placeholder="e.g. slow")
+        with col3:
+            label = st.selectbox("**Sentiment**", ["any"] + LABELS, key="drill_label")
+        with col4:
+            mode = st.selectbox("**Match**", MATCH_MODES, key="drill_mode",
+                                help="exact: the word itself · prefix: words starting with it · "
+                                     "lemma: singular and plural forms (refund, refunds)")
+        page_size = st.slider("**Reviews per page:**", 1, min(DRILL_PAGE_SIZE, len(df)), 5, key="review_slider")
+
+        filters = {"aspect": aspect, "opinion": opinion, "label": None if label == "any" else label, "mode": mode}
+        started = time.perf_counter()
+        matches = index.reviews(**filters)
+        seconds = time.perf_counter() - started
+        n_pages = max(1, -(-len(matches) // page_size))
+        # A new query starts again at its first page
+        page = st.number_input(f"**Page** (of {n_pages})", 1, n_pages, 1,
+                               key=f"drill_page_{aspect}_{opinion}_{label}_{mode}_{page_size}") - 1
+
+        suggestions = index.suggest(aspect.strip().lower(), limit=8)
+        mentions = index.label_counts(aspect, opinion, mode) if aspect or opinion else None
+        st.caption(f"🔎 {len(matches)} of {len(df)} reviews match ({seconds * 1000:.1f} ms)"
+                   + (" · mentions: " + ", ".join(f"{k} {v}" for k, v in mentions.items()) if mentions else "")
+                   + " · top aspects: " + ", ".join(f"{a} ({n})" for a, n in suggestions))
+
+        for idx in matches[page * page_size:(page + 1) * page_size]:
+            idx = int(idx)
+            row = df.iloc[idx]
         
-        # Create a custom card for each review
-        st.markdown(f"""
-        <div class="review-card">
-            <div style="display: flex; justify-content: space-between; align-items: start; margin-bottom: 0.5rem;">
-                <strong style="color: #58a6ff;">Review {idx+1}</strong>
-                <small style="color: #8b949e;">
-                    <i class="bi bi-calendar me-1"></i>{row.date} 
-                    <i class="bi bi-star ms-2 me-1"></i>{row.rating} ⭐
-                </small>
-            </div>
-            <div style="color: #f0f6fc; font-style: italic; margin-bottom: 0.5rem;">"{row.review}"</div>
-        """, unsafe_allow_html=True)
+            # Create a custom card for each review
+            st.markdown(f"""
+            <div class="review-card">
+                <div style="display: flex; justify-content: space-between; align-items: start; margin-bottom: 0.5rem;">
+                    <strong style="color: #58a6ff;">Review {idx+1}</strong>
+                    <small style="color: #8b949e;">
+                        <i class="bi bi-calendar me-1"></i>{row.date} 
+                        <i class="bi bi-star ms-2 me-1"></i>{row.rating} ⭐
+                    </small>
+                </div>
+                <div style="color: #f0f6fc; font-style: italic; margin-bottom: 0.5rem;">"{row.review}"</div>
+            """, unsafe_allow_html=True)
         
-        pairs = aspect_table[idx]
-        if not pairs:
-            st.markdown('<small style="color: #8b949e;"><i class="bi bi-info-circle me-1"></i>No aspect-opinion pairs detected</small>', unsafe_allow_html=True)
-        else:
-            st.markdown('<div style="margin-top: 0.5rem;"><strong style="color: #8b949e;"><i class="bi bi-tags me-1"></i>Detected Aspects & Opinions:</strong></div>', unsafe_allow_html=True)
+            pairs = aspect_table[idx]
+            if not pairs:
+                st.markdown('<small style="color: #8b949e;"><i class="bi bi-info-circle me-1"></i>No aspect-opinion pairs detected</small>', unsafe_allow_html=True)
+            else:
+                st.markdown('<div style="margin-top: 0.5rem;"><strong style="color: #8b949e;"><i class="bi bi-tags me-1"></i>Detected Aspects & Opinions:</strong></div>', unsafe_allow_html=True)
             
-            # Create aspect-opinion pairs with colored sentiment tags
-            aspect_html = []
-            for aspect, opinion, sentiment in pairs:
-                sentiment_class = f"opinion-{sentiment}"
-                icon = "emoji-smile" if sentiment == "positive" else "emoji-neutral" if sentiment == "neutral" else "emoji-frown"
-                aspect_html.append(f"""
-                    <span class="aspect-tag">
-                        <strong>{aspect}</strong>: 
-                        <span class="aspect-tag {sentiment_class}">
-                            <i class="bi bi-{icon} me-1"></i>{opinion}
+                # Create aspect-opinion pairs with colored sentiment tags
+                aspect_html = []
+                for aspect, opinion, sentiment in pairs:
+                    sentiment_class = f"opinion-{sentiment}"
+                    icon = "emoji-smile" if sentiment == "positive" else "emoji-neutral" if sentiment == "neutral" else "emoji-frown"
+                    aspect_html.append(f"""
+                        <span class="aspect-tag">
+                            <strong>{aspect}</strong>: 
+                            <span class="aspect-tag {sentiment_class}">
+                                <i class="bi bi-{icon} me-1"></i>{opinion}
+                            </span>
                         </span>
-                    </span>
-                """)
+                    """)
             
-            st.markdown("".join(aspect_html), unsafe_allow_html=True)
+                st.markdown("".join(aspect_html), unsafe_allow_html=True)
         
-        st.markdown("</div>", unsafe_allow_html=True)
+            st.markdown("</div>", unsafe_allow_html=True)
+
+    review_cards(df, aspect_table, aspect_index)
 
     st.markdown("</div></div>", unsafe_allow_html=True)
 
     # Overall Sentiment Banner
-    pos, neu, neg = aspect_df["Positive"].sum(), aspect_df["Neutral"].sum(), aspect_df["Negative"].sum()
+    pos, neu, neg = views["totals"]
     overall = "positive" if sentiment_score > 0.05 else "negative" if sentiment_score < -0.05 else "neutral"
     
     sentiment_color = {
@@ -873,6 +985,40 @@ if st.session_state.analysis_complete and 'aspect_df' in st.session_state:
     </div>
     """, unsafe_allow_html=True)
 
+# Diagnostics: where the time went, for this run and for the server process
+if diagnostics:
+    from metrics import METRICS, stage_table
+    import pandas as pd
+    with st.expander("🩺 **Diagnostics**", expanded=True):
+        job = st.session_state.get("job")
+        if job is not None and job.finished:
+            run = {k: v for k, v in job.stats.items() if k.endswith("_seconds")}
+            st.markdown(f"**Last run** · {job.key[1]} · {job.status}")
+            st.dataframe(pd.DataFrame([run]), use_container_width=True)
+            for name in ("throttle", "analysis_cache"):
+                if job.stats.get(name):
+                    st.caption(f"{name}: " + ", ".join(f"{k}={v:g}" for k, v in job.stats[name].items()))
+            if job.profile:
+                st.markdown("**cProfile** (top functions by cumulative time on the job thread)")
+                st.code(job.profile, language="text")
+
+        snapshot = METRICS.snapshot()
+        counters = snapshot["counters"]
+        st.markdown(f"**Server process** · up {snapshot['uptime_seconds']:.0f}s · "
+                    f"jobs {job_manager().stats()}")
+        st.dataframe(pd.DataFrame(stage_table(snapshot)), use_container_width=True)
+        looked_up = counters.get("analysis_cache_hits_total", 0) + counters.get("analysis_cache_misses_total", 0)
+        hit_rate = f"{counters.get('analysis_cache_hits_total', 0) / looked_up:.1%}" if looked_up else "n/a"
+        st.caption(f"📥 {counters.get('scrape_requests_total', 0)} requests, "
+                   f"{counters.get('scrape_bytes_total', 0) / 1e6:.1f} MB downloaded · "
+                   f"analysis cache hit rate {hit_rate} · "
+                   + ", ".join(f"{k}={v}" for k, v in snapshot["gauges"].items()))
+        col1, col2 = st.columns(2)
+        with col1:
+            st.download_button("⬇️ metrics.json", METRICS.to_json(), "metrics.json", "application/json")
+        with col2:
+            st.download_button("⬇️ metrics.prom", METRICS.to_prometheus(), "metrics.prom", "text/plain")
+
 # Footer
 st.markdown("""
 <div class="footer">
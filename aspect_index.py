@@ -0,0 +1,128 @@
+import bisect
+from functools import reduce
+
+import numpy as np
+
+from absa import LABELS, LABEL_CODES
+
+MATCH_MODES = ("exact", "prefix", "lemma")
+DRILL_PAGE_SIZE = 10
+
+# Plural endings folded by lemma(), longest first; words ending in KEEP_ENDINGS
+# are left alone ("address", "status", "analysis")
+PLURAL_ENDINGS = (("ies", "y"), ("sses", "ss"), ("xes", "x"), ("ches", "ch"), ("shes", "sh"), ("s", ""))
+KEEP_ENDINGS = ("ss", "us", "is")
+
+def lemma(word):
+    # Rule-based plural folding, enough to put "refunds", "deliveries" and "boxes"
+    # with "refund", "delivery" and "box" without loading WordNet
+    word = word.lower()
+    if len(word) <= 3 or word.endswith(KEEP_ENDINGS):
+        return word
+    for ending, replacement in PLURAL_ENDINGS:
+        if word.endswith(ending):
+            return word[:-len(ending)] + replacement
+    return word
+
+class Vocabulary:
+    # One column's names with the lookups a query term can use: exact, prefix
+    # (a binary search over the sorted names) and lemma
+    def __init__(self, names):
+        self.ids = {name: i for i, name in enumerate(names)}
+        self.sorted = sorted(self.ids)
+        self.lemmas = {}
+        for name, i in self.ids.items():
+            self.lemmas.setdefault(lemma(name), []).append(i)
+
+    def match(self, term, mode="exact"):
+        # Ids of the names `term` matches
+        term = term.strip().lower()
+        if mode == "exact":
+            return [self.ids[term]] if term in self.ids else []
+        if mode == "prefix":
+            start = bisect.bisect_left(self.sorted, term)
+            stop = bisect.bisect_left(self.sorted, term + "\uffff")
+            return [self.ids[name] for name in self.sorted[start:stop]]
+        if mode == "lemma":
+            return self.lemmas.get(lemma(term), [])
+        raise ValueError(f"unknown match mode {mode!r}; choose from {', '.join(MATCH_MODES)}")
+
+class Postings:
+    # For every name id, the ids of the pairs using it in ascending order:
+    # posting list i is pairs[starts[i]:starts[i+1]]
+    def __init__(self, pair_names, n_names):
+        self.pairs = np.argsort(pair_names, kind="stable").astype(np.int32)
+        self.starts = np.searchsorted(pair_names[self.pairs], np.arange(n_names + 1))
+
+    def get(self, ids):
+        lists = [self.pairs[self.starts[i]:self.starts[i + 1]] for i in ids]
+        if len(lists) == 1:
+            return lists[0]
+        return np.unique(np.concatenate(lists)) if lists else self.pairs[:0]
+
+    def counts(self):
+        return np.diff(self.starts)
+
+class AspectIndex:
+    # Inverted index over an AspectTable, built once an analysis finishes: aspect,
+    # opinion and label -> the pairs that use them, and pair -> review and label. A
+    # filtered query intersects sorted posting lists instead of rescanning every
+    # pair, so it stays in the milliseconds for 100k+ reviews. Review ids are row
+    # numbers in the analysis's review DataFrame.
+    def __init__(self, aspect_table):
+        offsets = np.frombuffer(aspect_table.offsets, dtype=np.int64)
+        self.n_reviews = len(aspect_table)
+        self.pair_reviews = np.repeat(np.arange(self.n_reviews, dtype=np.int32), np.diff(offsets))
+        self.pair_labels = np.frombuffer(aspect_table.pair_labels, dtype=np.int8).copy()
+        self.aspects = Vocabulary(aspect_table.aspects)
+        self.opinions = Vocabulary(aspect_table.opinions)
+        self.aspect_names = list(aspect_table.aspects)
+        self.aspect_postings = Postings(np.frombuffer(aspect_table.pair_aspects, dtype=np.int32),
+                                        len(aspect_table.aspects))
+        self.opinion_postings = Postings(np.frombuffer(aspect_table.pair_opinions, dtype=np.int32),
+                                         len(aspect_table.opinions))
+        self.label_postings = Postings(self.pair_labels, len(LABELS))
+
+    def __len__(self):
+        return len(self.pair_reviews)
+
+    def pairs(self, aspect=None, opinion=None, label=None, mode="exact"):
+        # Ids of the pairs matching every filter given; an aspect and an opinion
+        # must occur in the same pair ("refund" + "slow")
+        lists = []
+        if aspect:
+            lists.append(self.aspect_postings.get(self.aspects.match(aspect, mode)))
+        if opinion:
+            lists.append(self.opinion_postings.get(self.opinions.match(opinion, mode)))
+        if not lists:
+            return self.label_postings.get([LABEL_CODES[label]]) if label else np.arange(len(self), dtype=np.int32)
+        pairs = reduce(lambda a, b: np.intersect1d(a, b, assume_unique=True), lists)
+        if label:
+            pairs = pairs[self.pair_labels[pairs] == LABEL_CODES[label]]
+        return pairs
+
+    def reviews(self, aspect=None, opinion=None, label=None, mode="exact"):
+        # Sorted ids of the reviews with at least one matching pair; without any
+        # filter, every review, including those with no pairs
+        if not (aspect or opinion or label):
+            return np.arange(self.n_reviews, dtype=np.int32)
+        # Pair ids come back ascending, so their reviews are already sorted
+        reviews = self.pair_reviews[self.pairs(aspect, opinion, label, mode)]
+        return reviews[np.concatenate(([True], reviews[1:] != reviews[:-1]))] if len(reviews) else reviews
+
+    def page(self, page=0, page_size=DRILL_PAGE_SIZE, **filters):
+        # (review ids on this page, number of matching reviews)
+        reviews = self.reviews(**filters)
+        return reviews[page * page_size:(page + 1) * page_size], len(reviews)
+
+    def label_counts(self, aspect=None, opinion=None, mode="exact"):
+        # Matching pairs per label, e.g. to show next to a label filter
+        codes = self.pair_labels[self.pairs(aspect, opinion, mode=mode)]
+        return dict(zip(LABELS, np.bincount(codes, minlength=len(LABELS)).tolist()))
+
+    def suggest(self, prefix="", limit=20):
+        # Aspects starting with `prefix`, most mentioned first
+        ids = self.aspects.match(prefix, "prefix") if prefix else range(len(self.aspect_names))
+        counts = self.aspect_postings.counts()
+        ranked = sorted(ids, key=lambda i: (-counts[i], self.aspect_names[i]))
+        return [(self.aspect_names[i], int(counts[i])) for i in ranked[:limit]]
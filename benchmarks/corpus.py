@@ -0,0 +1,122 @@
+import os
+import json
+import random
+import hashlib
+
+from absa import LABEL_CODES
+
+ASPECTS = ["service", "delivery", "price", "support", "quality", "refund", "app", "website",
+           "staff", "product", "order", "experience", "communication", "shipping", "account",
+           "team", "payment", "packaging", "driver", "agent"]
+OPINIONS = {
+    "positive": ["great", "excellent", "fast", "helpful", "friendly", "good", "easy", "reliable",
+                 "amazing", "professional"],
+    "negative": ["terrible", "slow", "bad", "poor", "rude", "awful", "expensive", "useless",
+                 "horrible", "disappointing"],
+    "neutral": ["average", "usual", "standard", "other", "normal"],
+}
+TEMPLATES = [
+    "The {a} was {o}.",
+    "{O} {a} and {o2} {a2}.",
+    "I had a {o} {a} with this company.",
+    "Their {a} is {o}, but the {a2} was {o2}.",
+    "Very {o} {a}!",
+    "Ordered last week. {O} {a}, {o2} {a2}. Would order again.",
+    "I contacted them twice about my {a} and the {a2} was {o2} both times.",
+    "Honestly a {o} {a}. Nothing else to add.",
+]
+MODIFIERS = ["", "", "", "", "very", "really", "extremely", "quite", "too", "not", "not very", "never"]
+SIZES = {"1k": 1_000, "10k": 10_000, "100k": 100_000}
+# Review sentences with their expected (aspect, opinion) pairs under the extractor's
+# adjacent-adjective rule, assuming correct Penn Treebank tags
+LABELED_PAIRS = os.path.join(os.path.dirname(__file__), "fixtures", "labeled_pairs.jsonl")
+
+def _opinion(rng):
+    label = rng.choices(["positive", "negative", "neutral"], weights=[5, 3, 1])[0]
+    return rng.choice(OPINIONS[label]), label
+
+def synthetic_reviews(n, seed=0):
+    # Deterministic review dicts shaped like the scraper's output
+    rng = random.Random(seed)
+    reviews = []
+    for i in range(n):
+        sentences = []
+        for _ in range(rng.randint(1, 4)):
+            (o, _), (o2, _) = _opinion(rng), _opinion(rng)
+            a, a2 = rng.sample(ASPECTS, 2)
+            sentences.append(rng.choice(TEMPLATES).format(a=a, a2=a2, o=o, o2=o2, O=o.capitalize()))
+        text = " ".join(sentences)
+        reviews.append({
+            "rating": str(rng.randint(1, 5)),
+            "title": sentences[0][:40],
+            "review": text,
+            "date": f"2025-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+            "review_id": hashlib.sha1(f"{seed}:{i}".encode()).hexdigest()[:24],
+        })
+    return reviews
+
+def synthetic_pairs(n, seed=0):
+    # Per-review (aspect, opinion, label code) triples, for aggregation without a tagger
+    rng = random.Random(seed)
+    table = []
+    for _ in range(n):
+        pairs = []
+        for _ in range(rng.randint(0, 6)):
+            opinion, label = _opinion(rng)
+            pairs.append((rng.choice(ASPECTS), opinion, LABEL_CODES[label]))
+        table.append(pairs)
+    return table
+
+def synthetic_extracted_pairs(n, seed=0):
+    # Per-review (aspect, opinion, modifier) triples, as the extractor emits them
+    rng = random.Random(seed)
+    table = []
+    for _ in range(n):
+        table.append([(rng.choice(ASPECTS), _opinion(rng)[0], rng.choice(MODIFIERS))
+                      for _ in range(rng.randint(0, 6))])
+    return table
+
+def labeled_reviews(path=LABELED_PAIRS):
+    # [(text, {(aspect, opinion), ...}), ...]
+    with open(path, encoding="utf-8") as f:
+        rows = [json.loads(line) for line in f if line.strip()]
+    return [(r["text"], {tuple(p) for p in r["pairs"]}) for r in rows]
+
+def next_data_page(reviews, page, total_pages):
+    # A review page in the shape Trustpilot serves: Next.js JSON plus rendered sections
+    props = {"props": {"pageProps": {
+        "reviews": [{
+            "id": r["review_id"],
+            "title": r["title"],
+            "text": r["review"],
+            "rating": int(r["rating"]),
+            "dates": {"publishedDate": f"{r['date']}T10:00:00.000Z", "experiencedDate": None},
+            "consumer": {"displayName": "Customer", "countryCode": "GB"},
+        } for r in reviews],
+        "filters": {"pagination": {"currentPage": page, "totalPages": total_pages}},
+    }}}
+    script = ('<script id="__NEXT_DATA__" type="application/json">'
+              + json.dumps(props) + "</script>")
+    return dom_page(reviews, page, total_pages).replace("</body>", script + "</body>")
+
+def dom_page(reviews, page, total_pages):
+    sections = "".join(
+        '<article class="paper_paper__1PY90 styles_reviewCard__hcAvl">'
+        '<aside class="styles_consumerInfoWrapper__KP3Ra"><span>Customer</span></aside>'
+        '<section class="styles_reviewContentwrapper__K2aRu">'
+        f'<div class="styles_reviewHeader__iU9Px" data-service-review-rating="{r["rating"]}">'
+        f'<img alt="Rated {r["rating"]} out of 5 stars"/></div>'
+        f'<div data-testid="review-badge-date"><time datetime="{r["date"]}">{r["date"]}</time></div>'
+        f'<h2 class="typography_heading-s__f7029">{r["title"]}</h2>'
+        f'<p class="typography_body-l__KUYFJ" data-service-review-text-typography="true">{r["review"]}</p>'
+        '</section></article>'
+        for r in reviews)
+    links = "".join(f'<a name="pagination-button-{p}" href="/review/example.com?page={p}">{p}</a>'
+                    for p in range(max(1, page - 2), min(total_pages, page + 2) + 1))
+    links += (f'<a name="pagination-button-last" href="/review/example.com?page={total_pages}">'
+              f'{total_pages}</a>')
+    # Navigation, scripts and styles make up most of a real page's weight
+    chrome = "".join(f'<div class="styles_filler__{i:04x}"><span>menu item {i}</span></div>'
+                     for i in range(400))
+    return (f"<!DOCTYPE html><html><head><title>Reviews | page {page}</title></head><body>"
+            f"<header>{chrome}</header><main>{sections}</main><nav>{links}</nav></body></html>")
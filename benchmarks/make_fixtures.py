@@ -0,0 +1,37 @@
+import os
+import sys
+import argparse
+
+from benchmarks.corpus import synthetic_reviews, next_data_page, dom_page
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures")
+
+def write(name, html):
+    os.makedirs(FIXTURES, exist_ok=True)
+    with open(os.path.join(FIXTURES, name), "w", encoding="utf-8") as f:
+        f.write(html)
+    print(f"wrote fixtures/{name} ({len(html) // 1024} KB)", file=sys.stderr)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write the review-page fixtures used by the benchmarks.")
+    parser.add_argument("--record", metavar="DOMAIN",
+                        help="download live pages for DOMAIN instead of generating them")
+    parser.add_argument("--pages", type=int, default=2, help="pages to record (default: 2)")
+    args = parser.parse_args(argv)
+
+    if args.record:
+        from scraper import TRUSTPILOT_BASE, make_session, fetch_page, page_url
+        session = make_session(1)
+        for page in range(1, args.pages + 1):
+            html = fetch_page(session, page_url(f"{TRUSTPILOT_BASE}{args.record}", page))
+            if html is None:
+                sys.exit(f"page {page} of {args.record} could not be fetched")
+            write(f"recorded_page_{page}.html", html)
+        return
+
+    reviews = synthetic_reviews(20, seed=42)
+    write("review_page_next_data.html", next_data_page(reviews, 1, 120))
+    write("review_page_dom.html", dom_page(reviews, 1, 120))
+
+if __name__ == "__main__":
+    main()
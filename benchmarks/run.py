@@ -0,0 +1,246 @@
+import gc
+import os
+import sys
+import glob
+import json
+import time
+import platform
+import argparse
+import statistics
+import subprocess
+
+import nltk
+import numpy as np
+import pandas as pd
+import textblob
+from bs4 import BeautifulSoup
+from textblob import TextBlob
+
+from absa import (AspectAggregator, AspectTable, PolarityLookup, POLARITY_TABLE_PATH, LexiconSentiment,
+                  TextBlobSentiment, TAGGER_BACKENDS, extract_aspects_batch, analyze_aspects, label_codes,
+                  get_tagger_backend, nltk_data_missing)
+from scraper import parse_review_page
+from benchmarks.corpus import (SIZES, synthetic_reviews, synthetic_pairs, synthetic_extracted_pairs,
+                               labeled_reviews)
+from benchmarks.make_fixtures import FIXTURES
+
+TEXTBLOB_PAIR_CAP = 10_000  # the per-pair TextBlob baseline is too slow for full corpora
+
+def measure(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return times
+
+def result(case, size, items, unit, times=None, status="ok", note=None):
+    row = {"case": case, "size": size, "items": items, "unit": unit, "status": status}
+    if times:
+        median = statistics.median(times)
+        row.update(repeat=len(times), min_s=min(times), median_s=median,
+                   items_per_s=items / median if median else None)
+    if note:
+        row["note"] = note
+    return row
+
+def parse_html_parser_baseline(html):
+    # The original scraper's parse, kept as a reference point
+    soup = BeautifulSoup(html, "html.parser")
+    reviews = []
+    for s in soup.find_all("section", class_="styles_reviewContentwrapper__K2aRu"):
+        title = s.find("h2").get_text(strip=True) if s.find("h2") else ""
+        rev = s.find("p").get_text(strip=True) if s.find("p") else ""
+        if rev:
+            reviews.append({"title": title, "review": rev})
+    return reviews
+
+def bench_parsing(repeat):
+    rows = []
+    for path in sorted(glob.glob(os.path.join(FIXTURES, "*.html"))):
+        with open(path, encoding="utf-8") as f:
+            html = f.read()
+        name = os.path.basename(path)
+        n = len(parse_review_page(html)[0])
+        rows.append(result("parse_page", name, n, "reviews",
+                           measure(lambda: parse_review_page(html), repeat)))
+        rows.append(result("parse_page_html_parser_baseline", name, n, "reviews",
+                           measure(lambda: parse_html_parser_baseline(html), repeat)))
+    return rows
+
+def bench_tagging(size, texts, repeat):
+    if nltk_data_missing():
+        return [result("tokenize_tag", size, len(texts), "reviews", status="skipped",
+                       note="NLTK punkt/tagger data not installed")]
+    rows = [result("tokenize_tag", size, len(texts), "reviews",
+                   measure(lambda: list(extract_aspects_batch(texts)), repeat))]
+    df = pd.DataFrame({"review": texts})
+    rows.append(result("analyze_aspects", size, len(texts), "reviews",
+                       measure(lambda: analyze_aspects(df, workers=1), repeat)))
+    return rows
+
+def pair_scores(expected, found):
+    # Micro-averaged precision, recall and F1 of extracted (aspect, opinion) pairs
+    hits = sum(len(e & f) for e, f in zip(expected, found))
+    n_found, n_expected = sum(map(len, found)), sum(map(len, expected))
+    precision = hits / n_found if n_found else 0.0
+    recall = hits / n_expected if n_expected else 0.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    return precision, recall, f1
+
+def bench_tagger_backends(size, texts, repeat):
+    # Every tokenizer/tagger backend on the same corpus: throughput, how often it
+    # tags a review exactly as the nltk backend does and yields the same pairs,
+    # and pair accuracy on the hand-labeled sample.
+    if nltk_data_missing():
+        return [result(f"tokenize_tag_{name}", size, len(texts), "reviews", status="skipped",
+                       note="NLTK punkt/tagger data not installed") for name in TAGGER_BACKENDS]
+    labeled = labeled_reviews()
+    expected = [pairs for _, pairs in labeled]
+    reference = get_tagger_backend("nltk")
+    reference_tags = reference.tag_sents([reference.tokenize(t) for t in texts])
+    reference_pairs = list(extract_aspects_batch(texts, tagger="nltk"))
+    rows = []
+    for name in TAGGER_BACKENDS:
+        backend = get_tagger_backend(name)
+        times = measure(lambda: list(extract_aspects_batch(texts, tagger=name)), repeat)
+        tags = backend.tag_sents([backend.tokenize(t) for t in texts])
+        pairs = list(extract_aspects_batch(texts, tagger=name))
+        found = [{(a, o) for a, o, _ in review} for review in extract_aspects_batch(
+            [text for text, _ in labeled], tagger=name)]
+        precision, recall, f1 = pair_scores(expected, found)
+        note = (f"labeled sample ({len(labeled)} reviews): pair precision {precision:.1%}, recall {recall:.1%}, "
+                f"F1 {f1:.1%}")
+        if name != "nltk":
+            same_tags = sum(a == b for a, b in zip(tags, reference_tags)) / len(texts)
+            same_pairs = sum(a == b for a, b in zip(pairs, reference_pairs)) / len(texts)
+            note += f"; same tags as nltk on {same_tags:.1%} of reviews, same pairs on {same_pairs:.1%}"
+        rows.append(result(f"tokenize_tag_{name}", size, len(texts), "reviews", times, note=note))
+    return rows
+
+def bench_polarity(size, pairs, repeat):
+    opinions = [opinion for review in pairs for _, opinion, _ in review]
+    lookup = PolarityLookup(POLARITY_TABLE_PATH)
+    rows = [result("polarity_lookup", size, len(opinions), "pairs",
+                   measure(lambda: [lookup.polarity(o) for o in opinions], repeat))]
+    sample = opinions[:TEXTBLOB_PAIR_CAP]
+    rows.append(result("polarity_textblob_baseline", size, len(sample), "pairs",
+                       measure(lambda: [TextBlob(o).sentiment.polarity for o in sample], 1),
+                       note=f"capped at {TEXTBLOB_PAIR_CAP} pairs, single run"))
+    return rows
+
+def bench_sentiment(size, extracted, repeat):
+    # Labelling a corpus's pairs with each backend, and how often they agree. The
+    # lexicon engine applies negation and intensifiers, so it is also checked
+    # against TextBlob scoring the same "modifier opinion" phrase.
+    table = AspectTable()
+    for review in extracted:
+        table.append_extracted(review)
+    n = len(table.pair_opinions)
+    textblob = TextBlobSentiment(PolarityLookup(POLARITY_TABLE_PATH))
+    lexicon = LexiconSentiment()
+
+    def label_lexicon():
+        lexicon.scored.clear()   # include scoring the vocabularies, as a fresh table would
+        return lexicon.label_pairs(table)
+
+    by_textblob, by_lexicon = textblob.label_pairs(table), label_lexicon()
+    cap = min(n, TEXTBLOB_PAIR_CAP)
+    phrases = [f"{table.modifiers[m]} {table.opinions[o]}".strip()
+               for o, m in zip(table.pair_opinions[:cap], table.pair_modifiers[:cap])]
+    by_phrase = label_codes(np.array([TextBlob(p).sentiment.polarity for p in phrases]))
+    return [
+        result("sentiment_textblob", size, n, "pairs", measure(lambda: textblob.label_pairs(table), repeat)),
+        result("sentiment_lexicon", size, n, "pairs", measure(label_lexicon, repeat),
+               note=f"agrees with sentiment_textblob on {(by_lexicon == by_textblob).mean():.1%} of pairs, "
+                    f"with TextBlob on the modifier phrase on {(by_lexicon[:cap] == by_phrase).mean():.1%}"),
+        result("sentiment_textblob_phrase_baseline", size, cap, "pairs",
+               measure(lambda: [TextBlob(p).sentiment.polarity for p in phrases], 1),
+               note=f"capped at {TEXTBLOB_PAIR_CAP} pairs, single run"),
+    ]
+
+def bench_aggregation(size, pairs, repeat):
+    n_pairs = sum(len(p) for p in pairs)
+
+    def build():
+        table = AspectTable()
+        for review in pairs:
+            table.append(review)
+        return table
+
+    aggregator = AspectAggregator(polarity=PolarityLookup())
+    aggregator.aspect_table = build()
+    return [
+        result("aspect_table_build", size, n_pairs, "pairs", measure(build, repeat)),
+        result("aggregate_summary", size, n_pairs, "pairs", measure(aggregator.summary, repeat)),
+    ]
+
+def metadata():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(FIXTURES)).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "git_commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "versions": {"nltk": nltk.__version__, "textblob": textblob.__version__,
+                     "pandas": pd.__version__, "numpy": np.__version__},
+        "nltk_data": not nltk_data_missing(),
+    }
+
+def compare(previous, current):
+    # Prints old/new median ratios for the cases both runs share
+    old = {(r["case"], r["size"]): r for r in previous["results"] if r.get("median_s")}
+    print(f"{'case':36} {'size':28} {'old s':>10} {'new s':>10} {'speedup':>8}", file=sys.stderr)
+    for r in current["results"]:
+        before = old.get((r["case"], r["size"]))
+        if before and r.get("median_s"):
+            print(f"{r['case']:36} {r['size']:28} {before['median_s']:10.4f} {r['median_s']:10.4f} "
+                  f"{before['median_s'] / r['median_s']:7.2f}x", file=sys.stderr)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline benchmarks for parsing and ABSA.")
+    parser.add_argument("--sizes", default="1k,10k", help=f"corpus sizes from {', '.join(SIZES)}")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--cases", default="parsing,tagging,taggers,polarity,sentiment,aggregation")
+    parser.add_argument("--out", help="write results JSON here instead of stdout")
+    parser.add_argument("--compare", metavar="JSON", help="earlier results to compare against")
+    args = parser.parse_args(argv)
+    cases = set(args.cases.split(","))
+
+    rows = []
+    if "parsing" in cases:
+        rows += bench_parsing(args.repeat)
+    for size in args.sizes.split(","):
+        n = SIZES[size]
+        texts = [r["review"] for r in synthetic_reviews(n)] if cases & {"tagging", "taggers"} else None
+        if "tagging" in cases:
+            rows += bench_tagging(size, texts, args.repeat)
+        if "taggers" in cases:
+            rows += bench_tagger_backends(size, texts, args.repeat)
+        pairs = synthetic_pairs(n) if cases & {"polarity", "aggregation"} else None
+        if "polarity" in cases:
+            rows += bench_polarity(size, pairs, args.repeat)
+        if "sentiment" in cases:
+            rows += bench_sentiment(size, synthetic_extracted_pairs(n), args.repeat)
+        if "aggregation" in cases:
+            rows += bench_aggregation(size, pairs, args.repeat)
+
+    report = {"meta": metadata(), "results": rows}
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(json.load(f), report)
+
+if __name__ == "__main__":
+    main()
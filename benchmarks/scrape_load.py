@@ -0,0 +1,67 @@
+import sys
+import json
+import time
+import argparse
+
+from scraper import iter_trustpilot
+from benchmarks.run import metadata
+from benchmarks.standin import add_arguments, from_args
+
+def scrape_once(args, workers):
+    # A fresh stand-in per run so every worker count sees the same seeded faults
+    stats = {}
+    row = {"case": "scrape", "workers": workers, "rate_limit": args.rate, "max_rate": args.max_rate}
+    with from_args(args) as standin:
+        started = time.perf_counter()
+        try:
+            reviews = sum(len(batch) for batch in iter_trustpilot(
+                args.domain, workers=workers, rate_limit=args.rate, max_rate=args.max_rate, stats=stats,
+                base_url=standin.base_url))
+            row["status"] = "ok"
+        except Exception as e:
+            reviews = stats.get("new_reviews", 0)
+            row.update(status="error", error=f"{type(e).__name__}: {e}")
+        seconds = time.perf_counter() - started
+        server = dict(standin.stats)
+    server.pop("in_flight", None)
+    row.update(pages=stats.get("pages", 0), reviews=reviews, seconds=seconds,
+               pages_per_s=stats.get("pages", 0) / seconds if seconds else None, server=server,
+               throttle=stats.get("throttle"))
+    return row
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Measure scrape throughput and concurrency against the local stand-in.")
+    add_arguments(parser)
+    parser.add_argument("--workers", default="1,4,8", help="comma-separated worker counts to compare")
+    parser.add_argument("--rate", type=float, default=0.0,
+                        help="client's starting requests per second (0: unlimited)")
+    parser.add_argument("--max-rate", type=float, default=0.0, help="ceiling for the adaptive rate")
+    parser.add_argument("--domain", default="example.com")
+    parser.add_argument("--out", help="write results JSON here instead of stdout")
+    args = parser.parse_args(argv)
+
+    rows = []
+    for workers in (int(w) for w in args.workers.split(",")):
+        row = scrape_once(args, workers)
+        print(f"workers={workers}: {row['pages']} pages in {row['seconds']:.2f}s "
+              f"({row['pages_per_s']:.1f} pages/s, max {row['server']['max_in_flight']} in flight) "
+              f"{row['status']}", file=sys.stderr)
+        if row["throttle"]:
+            t = row["throttle"]
+            print(f"  {t['retries']} retries, {t['throttled']} throttled, {t['server_errors']} 5xx, "
+                  f"{t['network_errors']} network errors; rate {t['low_rate']:.1f}..{t['peak_rate']:.1f}/s",
+                  file=sys.stderr)
+        rows.append(row)
+
+    settings = {k: v for k, v in vars(args).items() if k not in ("out", "workers")}
+    report = {"meta": metadata(), "settings": settings, "results": rows}
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+import re
+import sys
+import time
+import zlib
+import random
+import argparse
+import threading
+from urllib.parse import urlsplit, parse_qs, unquote
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from benchmarks.corpus import synthetic_reviews, next_data_page, dom_page
+
+REVIEW_PATH = re.compile(r"^/review/([^/?]+)$")
+
+class StandIn:
+    # A local Trustpilot stand-in: serves /review/<domain>?page=N from synthetic
+    # pages and injects latency, 429/5xx responses and slow or truncated bodies.
+    # Faults are drawn from one seeded RNG, so a run with the same settings and
+    # request order sees the same faults. With `capacity`, requests beyond that
+    # many per second are answered 429, like a server-side rate limit.
+    def __init__(self, pages=20, per_page=20, markup="next_data", latency=0.0, jitter=0.0,
+                 rate_429=0.0, retry_after=1, rate_5xx=0.0, rate_slow=0.0, slow_seconds=2.0,
+                 rate_truncate=0.0, capacity=0.0, seed=0, host="127.0.0.1", port=0):
+        self.pages = pages
+        self.per_page = per_page
+        self.render = next_data_page if markup == "next_data" else dom_page
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_429 = rate_429
+        self.retry_after = retry_after
+        self.rate_5xx = rate_5xx
+        self.rate_slow = rate_slow
+        self.slow_seconds = slow_seconds
+        self.rate_truncate = rate_truncate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.refilled = time.monotonic()
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.reviews = {}
+        self.cache = {}
+        self.stats = {"requests": 0, "in_flight": 0, "max_in_flight": 0}
+        self.server = ThreadingHTTPServer((host, port), _Handler)
+        self.server.daemon_threads = True
+        self.server.standin = self
+        self.thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/review/"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def page(self, domain, page):
+        # Rendered pages are cached so serving cost stays out of scrape timings
+        key = (domain, page)
+        with self.lock:
+            body = self.cache.get(key)
+        if body is None:
+            with self.lock:
+                if domain not in self.reviews:
+                    seed = zlib.crc32(domain.encode())
+                    self.reviews[domain] = synthetic_reviews(self.pages * self.per_page, seed=seed)
+                reviews = self.reviews[domain][(page - 1) * self.per_page:page * self.per_page]
+            body = self.render(reviews, page, self.pages).encode("utf-8")
+            with self.lock:
+                self.cache[key] = body
+        return body
+
+    def draw(self):
+        # One fault (or None) and this response's delay, decided under the lock
+        with self.lock:
+            roll = self.rng.random()
+            delay = self.latency + self.rng.uniform(0, self.jitter)
+        for fault, rate in (("429", self.rate_429), ("5xx", self.rate_5xx),
+                            ("slow", self.rate_slow), ("truncate", self.rate_truncate)):
+            if roll < rate:
+                return fault, delay
+            roll -= rate
+        return None, delay
+
+    def admit(self):
+        # Token bucket holding one second's worth of requests
+        if not self.capacity:
+            return True
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.refilled) * self.capacity)
+            self.refilled = now
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+    def count(self, key, delta=1):
+        with self.lock:
+            self.stats[key] = self.stats.get(key, 0) + delta
+            if key == "in_flight":
+                self.stats["max_in_flight"] = max(self.stats["max_in_flight"], self.stats["in_flight"])
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        standin = self.server.standin
+        standin.count("requests")
+        standin.count("in_flight")
+        try:
+            self.respond(standin)
+        except (BrokenPipeError, ConnectionResetError):
+            standin.count("client_disconnects")
+        finally:
+            standin.count("in_flight", -1)
+
+    def respond(self, standin):
+        url = urlsplit(self.path)
+        m = REVIEW_PATH.match(url.path)
+        page = int((parse_qs(url.query).get("page") or ["1"])[0])
+        fault, delay = standin.draw()
+        if delay:
+            time.sleep(delay)
+
+        if not m or not 1 <= page <= standin.pages:
+            standin.count("404")
+            return self.send_body(404, b"Not found")
+        if fault == "429" or not standin.admit():
+            standin.count("429")
+            return self.send_body(429, b"Too many requests", {"Retry-After": str(standin.retry_after)})
+        if fault == "5xx":
+            standin.count("5xx")
+            return self.send_body(503, b"Service unavailable")
+
+        body = standin.page(unquote(m.group(1)), page)
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if fault == "truncate":
+            # Promise the full length, send half, then drop the connection
+            standin.count("truncated")
+            self.wfile.write(body[:len(body) // 2])
+            self.close_connection = True
+            return
+        if fault == "slow":
+            standin.count("slow")
+            chunks = 20
+            size = -(-len(body) // chunks)
+            for i in range(0, len(body), size):
+                self.wfile.write(body[i:i + size])
+                self.wfile.flush()
+                time.sleep(standin.slow_seconds / chunks)
+            return
+        standin.count("200")
+        self.wfile.write(body)
+
+    def send_body(self, status, body, headers=None):
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Type", "text/plain")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+def add_arguments(parser):
+    parser.add_argument("--pages", type=int, default=20, help="review pages per domain")
+    parser.add_argument("--per-page", type=int, default=20, help="reviews per page")
+    parser.add_argument("--markup", choices=["next_data", "dom"], default="next_data")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every response")
+    parser.add_argument("--jitter", type=float, default=0.0, help="extra random latency, 0..N seconds")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="share of requests answered 429")
+    parser.add_argument("--retry-after", type=int, default=1, help="Retry-After seconds sent with 429s")
+    parser.add_argument("--rate-5xx", type=float, default=0.0, help="share of requests answered 503")
+    parser.add_argument("--rate-slow", type=float, default=0.0, help="share of bodies trickled out slowly")
+    parser.add_argument("--slow-seconds", type=float, default=2.0, help="how long a slow body takes")
+    parser.add_argument("--rate-truncate", type=float, default=0.0,
+                        help="share of bodies cut off halfway")
+    parser.add_argument("--capacity", type=float, default=0.0,
+                        help="requests per second served before answering 429 (0: no limit)")
+    parser.add_argument("--seed", type=int, default=0)
+
+def from_args(args, **kwargs):
+    return StandIn(pages=args.pages, per_page=args.per_page, markup=args.markup, latency=args.latency,
+                   jitter=args.jitter, rate_429=args.rate_429, retry_after=args.retry_after,
+                   rate_5xx=args.rate_5xx, rate_slow=args.rate_slow, slow_seconds=args.slow_seconds,
+                   rate_truncate=args.rate_truncate, capacity=args.capacity, seed=args.seed, **kwargs)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve synthetic Trustpilot review pages locally.")
+    add_arguments(parser)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8800)
+    args = parser.parse_args(argv)
+
+    standin = from_args(args, host=args.host, port=args.port)
+    print(f"serving on {standin.base_url}<domain>  (use --base-url with cli.py)", file=sys.stderr)
+    try:
+        standin.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        standin.server.server_close()
+        print(standin.stats, file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+import os
+import re
+import sys
+import json
+import time
+import argparse
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from absa import (ANALYSIS_WORKERS, SENTIMENT_BACKEND, SENTIMENT_BACKENDS, TAGGER_BACKEND, TAGGER_BACKENDS,
+                  ensure_nltk_data)
+from analysis_cache import AnalysisCache
+from ingest import CHUNK_ROWS
+from metrics import METRICS, profiled, serve_metrics
+from pipeline import run_pipeline, run_estimate, run_chunked
+from review_store import ReviewStore
+from scraper import RateLimiter, SCRAPE_WORKERS, SCRAPE_RATE_LIMIT, SCRAPE_MAX_RATE, TRUSTPILOT_BASE
+
+def read_domains(path):
+    with open(path, encoding="utf-8") as f:
+        lines = (line.split("#", 1)[0].strip() for line in f)
+        return list(dict.fromkeys(line for line in lines if line))
+
+def domain_dir(out_dir, domain):
+    return os.path.join(out_dir, re.sub(r"[^A-Za-z0-9._-]+", "_", domain))
+
+def write_frame(df, path, fmt):
+    if fmt == "parquet":
+        df.to_parquet(f"{path}.parquet", index=False)
+    else:
+        df.to_json(f"{path}.jsonl", orient="records", lines=True, force_ascii=False)
+
+def run_domain(domain, args, limiter, out, store, cache, stats, progress):
+    estimate = df = None
+    if args.chunked:
+        # Writes reviews.parquet and pairs.parquet into `out` as it goes
+        _, aspect_df, _ = run_chunked(
+            domain, out, chunk_rows=args.chunk_rows, cache=cache, stats=stats, timeout=args.deadline,
+            sentiment=args.sentiment, tagger=args.tagger, on_progress=progress, workers=args.workers,
+            analysis_workers=args.analysis_workers, limiter=limiter, base_url=args.base_url)
+    elif args.sample_pages or args.sample_seconds:
+        df, aspect_df, _, estimate = run_estimate(
+            domain, max_pages=args.sample_pages, max_seconds=args.sample_seconds, seed=args.seed,
+            cache=cache, stats=stats, sentiment=args.sentiment, tagger=args.tagger, on_progress=progress,
+            workers=args.workers, limiter=limiter, base_url=args.base_url)
+    else:
+        df, aspect_df, _ = run_pipeline(
+            domain, store=store, cache=cache, stats=stats, analysis_workers=args.analysis_workers,
+            timeout=args.deadline, sentiment=args.sentiment, tagger=args.tagger, on_progress=progress,
+            workers=args.workers, limiter=limiter, base_url=args.base_url)
+    return df, aspect_df, estimate
+
+def analyze_domain(domain, args, limiter):
+    stats = {"domain": domain}
+    store = ReviewStore(args.store) if args.store else None
+    cache = AnalysisCache(args.cache) if args.cache else None
+
+    def show_progress(event):
+        total = event.total if event.total is not None else "?"
+        print(f"{domain}: {event.stage} {event.done}/{total}", file=sys.stderr)
+
+    progress = show_progress if args.verbose else None
+    out = domain_dir(args.out, domain)
+    os.makedirs(out, exist_ok=True)
+    # Only this domain's own thread is profiled; fetches run on the scraper's threads
+    with profiled(os.path.join(out, "profile.prof")) if args.profile else nullcontext() as profile:
+        df, aspect_df, estimate = run_domain(domain, args, limiter, out, store, cache, stats, progress)
+    if profile:
+        with open(os.path.join(out, "profile.txt"), "w", encoding="utf-8") as f:
+            f.write(profile["report"])
+
+    started = time.perf_counter()
+    if df is not None:
+        write_frame(df, os.path.join(out, "reviews"), args.format)
+    write_frame(aspect_df, os.path.join(out, "aspects"), args.format)
+    if estimate is not None:
+        with open(os.path.join(out, "estimate.json"), "w", encoding="utf-8") as f:
+            json.dump(dict(estimate, score=estimate["score"]._asdict(),
+                           aspects=estimate["aspects"].to_dict("records")), f, indent=2)
+    stats["write_seconds"] = time.perf_counter() - started
+    with open(os.path.join(out, "stats.json"), "w", encoding="utf-8") as f:
+        json.dump(stats, f, indent=2)
+    return stats
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Scrape and analyze Trustpilot reviews for many domains without the Streamlit UI.")
+    parser.add_argument("domains", help="file with one domain per line (# starts a comment)")
+    parser.add_argument("--out", default="results", help="output directory (default: results)")
+    parser.add_argument("--format", choices=["parquet", "jsonl"], default="parquet")
+    parser.add_argument("--concurrency", type=int, default=4, help="domains processed at once")
+    parser.add_argument("--workers", type=int, default=SCRAPE_WORKERS, help="page fetches per domain")
+    parser.add_argument("--rate", type=float, default=SCRAPE_RATE_LIMIT,
+                        help="starting requests per second, shared by all domains (0: unlimited)")
+    parser.add_argument("--max-rate", type=float, default=SCRAPE_MAX_RATE,
+                        help="ceiling the shared rate may ramp up to while the server keeps up")
+    parser.add_argument("--analysis-workers", type=int, default=None,
+                        help="ABSA chunks in flight per domain on the shared worker pool (default: CPUs / concurrency)")
+    parser.add_argument("--base-url", default=TRUSTPILOT_BASE,
+                        help="review page URL prefix, e.g. a local stand-in (default: trustpilot.com)")
+    parser.add_argument("--deadline", type=float, default=None,
+                        help="seconds per domain before scraping stops and the reviews so far are analyzed")
+    parser.add_argument("--store", default=None, help="SQLite review store for incremental re-scrapes")
+    parser.add_argument("--cache", default=None,
+                        help="SQLite cache of per-review ABSA results, shared across domains and runs")
+    parser.add_argument("--sentiment", choices=sorted(SENTIMENT_BACKENDS), default=SENTIMENT_BACKEND,
+                        help="sentiment backend: per-word TextBlob polarity, or the vectorized lexicon engine "
+                             "with negation and intensifiers (default: %(default)s)")
+    parser.add_argument("--tagger", choices=sorted(TAGGER_BACKENDS), default=TAGGER_BACKEND,
+                        help="tokenizer/tagger backend: NLTK's word_tokenize and pos_tag, or a regex tokenizer "
+                             "in front of the same tagger (default: %(default)s)")
+    parser.add_argument("--sample-pages", type=int, default=None,
+                        help="fast estimate: sample this many pages instead of crawling them all")
+    parser.add_argument("--sample-seconds", type=float, default=None,
+                        help="fast estimate: sample pages for at most this long")
+    parser.add_argument("--seed", type=int, default=None, help="page sampling seed")
+    parser.add_argument("--chunked", action="store_true",
+                        help="stream reviews and aspect pairs to Parquet row groups, for very large domains")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS, help="reviews per row group / analysis chunk")
+    parser.add_argument("--metrics", default=None,
+                        help="write stage timings and counters here at the end (.prom: Prometheus text, else JSON)")
+    parser.add_argument("--metrics-port", type=int, default=None,
+                        help="serve /metrics and /metrics.json on this port while the run lasts")
+    parser.add_argument("--profile", action="store_true",
+                        help="cProfile each domain's run into <out>/<domain>/profile.prof and profile.txt")
+    parser.add_argument("-v", "--verbose", action="store_true", help="print progress events")
+    args = parser.parse_args(argv)
+    if args.analysis_workers is None:
+        args.analysis_workers = max(1, ANALYSIS_WORKERS // max(args.concurrency, 1))
+
+    domains = read_domains(args.domains)
+    ensure_nltk_data()
+    os.makedirs(args.out, exist_ok=True)
+    limiter = RateLimiter(args.rate, args.max_rate)
+    failed = 0
+    if args.metrics_port:
+        serve_metrics(args.metrics_port)
+
+    with open(os.path.join(args.out, "run_stats.jsonl"), "a", encoding="utf-8") as run_log, \
+            ThreadPoolExecutor(max_workers=max(args.concurrency, 1)) as pool:
+        futures = {pool.submit(analyze_domain, d, args, limiter): d for d in domains}
+        for future in as_completed(futures):
+            domain = futures[future]
+            try:
+                stats = future.result()
+                stats["status"] = "partial" if stats.get("partial") else "ok"
+                note = f" (partial: {stats['stop_reason']})" if stats.get("partial") else ""
+                print(f"{domain}: {stats['reviews']} reviews from {stats['pages']} pages "
+                      f"in {stats['total_seconds']:.1f}s{note}", file=sys.stderr)
+            except Exception as e:
+                failed += 1
+                stats = {"domain": domain, "status": "error", "error": f"{type(e).__name__}: {e}"}
+                print(f"{domain}: failed ({stats['error']})", file=sys.stderr)
+            run_log.write(json.dumps(stats) + "\n")
+            run_log.flush()
+
+    if args.metrics:
+        with open(args.metrics, "w", encoding="utf-8") as f:
+            f.write(METRICS.to_prometheus() if args.metrics.endswith(".prom") else METRICS.to_json())
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
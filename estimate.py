@@ -0,0 +1,87 @@
+import math
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from absa import LABEL_CODES
+
+CONFIDENCE = 0.95
+CONFIDENCE_Z = 1.96
+ESTIMATE_TOP_ASPECTS = 10
+
+Interval = namedtuple("Interval", ["value", "low", "high"])
+
+def ratio_interval(y, x, total_clusters, bounds, z=CONFIDENCE_Z):
+    # Ratio estimate sum(y)/sum(x) from sampled clusters (pages), with the usual
+    # linearised variance and a finite population correction for the pages not
+    # seen; with total_clusters unknown (None) there is no correction
+    n, x_sum = len(x), x.sum()
+    if not n or not x_sum:
+        return Interval(None, *bounds)
+    r = y.sum() / x_sum
+    if total_clusters and n >= total_clusters:
+        return Interval(float(r), float(r), float(r))
+    if n < 2:
+        return Interval(float(r), *bounds)
+    fpc = 1 - n / total_clusters if total_clusters else 1.0
+    var = fpc * ((y - r * x) ** 2).sum() / (n - 1) / (n * x.mean() ** 2)
+    half = z * math.sqrt(var)
+    return Interval(float(r), float(max(bounds[0], r - half)), float(min(bounds[1], r + half)))
+
+class PageSampleEstimator:
+    # Sentiment score and aspect shares from a sample of a domain's review pages.
+    # Each page is one cluster of reviews; estimates are ratios over aspect pairs,
+    # like the full analysis, and tighten as pages are added.
+    def __init__(self, total_pages=None, z=CONFIDENCE_Z):
+        self.total_pages = total_pages
+        self.z = z
+        self.reviews = 0
+        self.pairs = []        # (positive - negative, pairs) per page
+        self.aspects = []      # per-page aspect id counts
+
+    @property
+    def pages(self):
+        return len(self.pairs)
+
+    @property
+    def complete(self):
+        return bool(self.total_pages) and self.pages >= self.total_pages
+
+    def add_page(self, table, start, stop):
+        # Reviews start..stop of an AspectTable came from one page
+        lo, hi = table.offsets[start], table.offsets[stop]
+        labels = np.frombuffer(table.pair_labels, dtype=np.int8)[lo:hi]
+        aspects = np.frombuffer(table.pair_aspects, dtype=np.int32)[lo:hi]
+        score = int((labels == LABEL_CODES["positive"]).sum() - (labels == LABEL_CODES["negative"]).sum())
+        self.pairs.append((score, hi - lo))
+        self.aspects.append(np.bincount(aspects))
+        self.reviews += stop - start
+
+    def score(self):
+        y, x = np.array(self.pairs, dtype=float).reshape(-1, 2).T
+        return ratio_interval(y, x, self.total_pages, (-1.0, 1.0), self.z)
+
+    def aspect_shares(self, names, top=ESTIMATE_TOP_ASPECTS):
+        # Share of all aspect pairs taken by each of the most frequent aspects so far
+        width = max((len(c) for c in self.aspects), default=0)
+        counts = np.zeros((self.pages, width))
+        for i, c in enumerate(self.aspects):
+            counts[i, :len(c)] = c
+        x = counts.sum(axis=1)
+        rows = []
+        for a in np.argsort(-counts.sum(axis=0), kind="stable")[:top]:
+            share = ratio_interval(counts[:, a], x, self.total_pages, (0.0, 1.0), self.z)
+            rows.append({"Aspect": names[a], "Share": share.value, "Low": share.low, "High": share.high})
+        return pd.DataFrame(rows, columns=["Aspect", "Share", "Low", "High"])
+
+    def summary(self, names, top=ESTIMATE_TOP_ASPECTS):
+        return {
+            "pages": self.pages,
+            "total_pages": self.total_pages,
+            "reviews": self.reviews,
+            "complete": self.complete,
+            "confidence": CONFIDENCE,
+            "score": self.score(),
+            "aspects": self.aspect_shares(names, top),
+        }
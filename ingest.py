@@ -0,0 +1,62 @@
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from absa import LABELS
+from review_store import REVIEW_COLUMNS
+
+CHUNK_ROWS = 20_000   # reviews per Parquet row group and per analysis chunk
+
+REVIEW_SCHEMA = pa.schema([(column, pa.string()) for column in REVIEW_COLUMNS])
+PAIR_SCHEMA = pa.schema([
+    ("review", pa.int64()),    # row number in the reviews file
+    ("aspect", pa.dictionary(pa.int32(), pa.string())),
+    ("opinion", pa.dictionary(pa.int32(), pa.string())),
+    ("label", pa.dictionary(pa.int8(), pa.string())),
+])
+
+class ParquetSpool:
+    # Appends row groups to one Parquet file; nothing is kept once a group is written
+    def __init__(self, path, schema):
+        self.path = path
+        self.writer = pq.ParquetWriter(path, schema)
+        self.rows = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def write(self, table):
+        self.writer.write_table(table)
+        self.rows += table.num_rows
+
+    def close(self):
+        self.writer.close()
+
+def reviews_table(reviews):
+    return pa.Table.from_pydict(
+        {column: [str(r.get(column) or "") for r in reviews] for column in REVIEW_COLUMNS},
+        schema=REVIEW_SCHEMA)
+
+def pairs_table(aspect_table, first_review):
+    # An AspectTable's pairs as Arrow columns, reusing its interned ids as dictionary indices
+    offsets = np.frombuffer(aspect_table.offsets, dtype=np.int64)
+    reviews = np.repeat(np.arange(first_review, first_review + len(aspect_table), dtype=np.int64),
+                        np.diff(offsets))
+    return pa.Table.from_arrays([
+        pa.array(reviews),
+        pa.DictionaryArray.from_arrays(np.frombuffer(aspect_table.pair_aspects, dtype=np.int32),
+                                       pa.array(aspect_table.aspects, pa.string())),
+        pa.DictionaryArray.from_arrays(np.frombuffer(aspect_table.pair_opinions, dtype=np.int32),
+                                       pa.array(aspect_table.opinions, pa.string())),
+        pa.DictionaryArray.from_arrays(np.frombuffer(aspect_table.pair_labels, dtype=np.int8),
+                                       pa.array(LABELS, pa.string())),
+    ], schema=PAIR_SCHEMA)
+
+def iter_review_chunks(path, columns=None):
+    # Reads a spooled reviews file back one row group at a time, as DataFrames
+    f = pq.ParquetFile(path)
+    for group in range(f.num_row_groups):
+        yield f.read_row_group(group, columns=columns).to_pandas()
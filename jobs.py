@@ -0,0 +1,199 @@
+import time
+import uuid
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from aspect_index import AspectIndex
+from metrics import profiled
+from pipeline import run_pipeline, run_estimate
+from scraper import ProgressEvent, RateLimiter, SCRAPE_RATE_LIMIT, SCRAPE_MAX_RATE
+
+JOB_WORKERS = 2            # analyses running at once; later requests wait in the queue
+JOB_RESULT_TTL = 15 * 60   # seconds a finished analysis is handed to new requests for it
+JOB_CACHE_SIZE = 32        # finished analyses kept for reuse, oldest dropped first
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+def job_key(domain, budget=None, profile=False):
+    # Requests with the same key share one job; a fast estimate's budget is part of
+    # the request, and a profiled run never stands in for an unprofiled one
+    domain = domain.strip().lower()
+    key = ("estimate", domain, *budget) if budget else ("full", domain)
+    return key + ("profile",) if profile else key
+
+class Job:
+    # One background analysis, shared by every session that asked for the same thing.
+    # The worker thread reports through update() and report(); sessions poll
+    # snapshot() or block in wait() until something changes.
+    def __init__(self, key):
+        self.id = uuid.uuid4().hex
+        self.key = key
+        self.status = QUEUED
+        self.progress = {"scrape": ProgressEvent("scrape", 0, None), "analyze": ProgressEvent("analyze", 0, 0)}
+        self.live = None        # what the progress card shows while the job runs
+        self.result = None
+        self.error = None
+        self.stats = {}
+        self.profile = None     # cProfile report, for jobs that asked for one
+        self.watchers = 1       # sessions attached to the job; see detach()
+        self.cancel = threading.Event()
+        self.submitted_at = time.time()
+        self.started_at = self.finished_at = None
+        self.version = 0
+        self.changed = threading.Condition()
+
+    @property
+    def finished(self):
+        return self.status in (DONE, FAILED)
+
+    @property
+    def reusable(self):
+        # Stopped, failed or cut-off runs are returned to their own watchers only
+        if self.cancel.is_set() or self.status == FAILED:
+            return False
+        return not (self.finished and self.stats.get("partial"))
+
+    def update(self, **fields):
+        with self.changed:
+            for name, value in fields.items():
+                setattr(self, name, value)
+            self.version += 1
+            self.changed.notify_all()
+
+    def report(self, event):
+        # A pipeline on_progress callback; the dict is replaced so snapshots never see it change
+        self.update(progress={**self.progress, event.stage: event})
+
+    def join(self):
+        # Another session attaches, unless the job can no longer be handed out. Runs
+        # under the same lock as detach(), so a job is never joined just as its last
+        # watcher cancels it. Returns whether the session joined.
+        with self.changed:
+            if not self.reusable:
+                return False
+            self.watchers += 1
+            self.version += 1
+            self.changed.notify_all()
+            return True
+
+    def detach(self):
+        # A watching session leaves. Only the last one to leave a running job cancels
+        # it, so one analyst stopping never cuts short another's analysis. A finished
+        # job keeps its result for later requests either way. Returns True when this
+        # was the last watcher.
+        with self.changed:
+            self.watchers = max(0, self.watchers - 1)
+            last = self.watchers == 0
+            if last and not self.finished:
+                self.cancel.set()
+            self.version += 1
+            self.changed.notify_all()
+            return last
+
+    def snapshot(self):
+        with self.changed:
+            return {
+                "id": self.id,
+                "status": self.status,
+                "progress": self.progress,
+                "live": self.live,
+                "error": self.error,
+                "watchers": self.watchers,
+                "cancelled": self.cancel.is_set(),
+                "version": self.version,
+                "seconds": (self.finished_at or time.time()) - (self.started_at or self.submitted_at),
+            }
+
+    def wait(self, version=None, timeout=None):
+        # Blocks until the job changes after `version` (or finishes); returns the new version
+        with self.changed:
+            self.changed.wait_for(lambda: self.version != version or self.finished, timeout)
+            return self.version
+
+class JobManager:
+    # Process-wide: runs jobs on worker threads, hands out the job already running
+    # for the same key instead of starting another, and keeps successful results
+    # for JOB_RESULT_TTL seconds so a repeated request costs nothing. `limiter` is
+    # the process-wide RateLimiter every job's scrape should share.
+    def __init__(self, workers=JOB_WORKERS, ttl=JOB_RESULT_TTL, max_finished=JOB_CACHE_SIZE, limiter=None):
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="analysis-job")
+        self.limiter = limiter or RateLimiter(SCRAPE_RATE_LIMIT, SCRAPE_MAX_RATE)
+        self.ttl = ttl
+        self.max_finished = max_finished
+        self.lock = threading.Lock()
+        self.jobs = {}
+        self.started = self.shared = 0
+
+    def submit(self, key, target, *args, **kwargs):
+        # target(job, *args, **kwargs) runs on a worker thread and returns the job's result
+        with self.lock:
+            self._prune()
+            job = self.jobs.get(key)
+            if job is not None and job.join():
+                self.shared += 1
+                return job
+            job = self.jobs[key] = Job(key)
+            self.started += 1
+        self.pool.submit(self._run, job, target, args, kwargs)
+        return job
+
+    def _run(self, job, target, args, kwargs):
+        job.update(status=RUNNING, started_at=time.time())
+        try:
+            result = target(job, *args, **kwargs)
+        except Exception as e:
+            job.update(status=FAILED, error=e, live=None, finished_at=time.time())
+        else:
+            job.update(status=DONE, result=result, live=None, finished_at=time.time())
+
+    def _prune(self):
+        now = time.time()
+        finished = []
+        for key, job in list(self.jobs.items()):
+            if not job.reusable or (job.finished and now - job.finished_at > self.ttl):
+                del self.jobs[key]
+            elif job.finished:
+                finished.append((job.finished_at, key))
+        for _, key in sorted(finished)[:max(0, len(finished) - self.max_finished)]:
+            del self.jobs[key]
+
+    def stats(self):
+        with self.lock:
+            self._prune()
+            statuses = [job.status for job in self.jobs.values()]
+            return {"queued": statuses.count(QUEUED), "running": statuses.count(RUNNING),
+                    "cached": statuses.count(DONE), "started": self.started, "shared": self.shared}
+
+    def shutdown(self):
+        for job in list(self.jobs.values()):
+            job.cancel.set()
+        self.pool.shutdown(wait=True, cancel_futures=True)
+
+def analysis_job(job, domain, budget=None, store=None, cache=None, timeout=None, profile=False, limiter=None):
+    # Job target for the app: the full pipeline, or a fast estimate when `budget` is
+    # (max_pages, max_seconds). The job's cancel event stops either one early, and
+    # the result is (df, aspect_df, aspect_table, estimate or None, AspectIndex);
+    # the index is built here so drill-down is ready when the results page opens.
+    # With `profile` the run is captured with cProfile and the report left in job.profile.
+    # Pass the manager's `limiter` so concurrent jobs stay under one request rate.
+    if profile:
+        with profiled() as report:
+            result = analysis_job(job, domain, budget, store, cache, timeout, limiter=limiter)
+        job.update(profile=report["report"])
+        return result
+    if budget:
+        def on_estimate(df, aspect_df, aspect_table, estimate):
+            job.update(live={"table": estimate["aspects"], "estimate": estimate})
+
+        df, aspect_df, aspect_table, estimate = run_estimate(
+            domain, max_pages=budget[0], max_seconds=budget[1], cache=cache, cancel=job.cancel,
+            stats=job.stats, on_estimate=on_estimate, on_progress=job.report, limiter=limiter)
+        return df, aspect_df, aspect_table, estimate, AspectIndex(aspect_table)
+
+    def on_update(aggregator, reviews):
+        job.update(live={"table": aggregator.summary().head(10), "estimate": None})
+
+    df, aspect_df, aspect_table = run_pipeline(
+        domain, store=store, cache=cache, timeout=timeout, cancel=job.cancel, stats=job.stats,
+        on_update=on_update, on_progress=job.report, limiter=limiter)
+    return df, aspect_df, aspect_table, None, AspectIndex(aspect_table)
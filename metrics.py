@@ -0,0 +1,228 @@
+import io
+import json
+import time
+import pstats
+import cProfile
+import threading
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Upper bounds, in seconds, of the latency histogram buckets (plus +Inf)
+LATENCY_BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+                   0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+METRICS_PREFIX = "absa_"
+PROFILE_TOP = 30   # functions listed in a profile's text report
+
+# What each instrumented hot path records; names follow Prometheus conventions
+METRIC_HELP = {
+    "scrape_requests_total": "HTTP requests sent to the review site, retries included",
+    "scrape_bytes_total": "Response bytes downloaded",
+    "scrape_request_seconds": "Latency of one HTTP request, body included",
+    "parse_page_seconds": "Time to parse one review page",
+    "tokenize_review_seconds": "Tokenizer time per review",
+    "tag_review_seconds": "POS tagging time per review",
+    "score_review_seconds": "Polarity scoring and labelling time per review",
+    "analyze_review_seconds": "Total analysis time per review, tagging included",
+    "polarity_textblob_seconds": "TextBlob polarity for one word outside the precomputed table",
+    "analysis_cache_hits_total": "Reviews whose pairs came from the analysis cache",
+    "analysis_cache_misses_total": "Reviews the analysis cache had to tag",
+    "render_chart_seconds": "Time to render one results chart",
+}
+
+class Histogram:
+    # Cumulative-style latency histogram: per-bucket counts, a running sum and count
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds=LATENCY_BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value, n=1):
+        # `n` records the same value n times, e.g. the per-review share of a batch
+        i = 0
+        while i < len(self.bounds) and value > self.bounds[i]:
+            i += 1
+        self.counts[i] += n
+        self.sum += value * n
+        self.count += n
+
+    def quantile(self, q):
+        # Linear interpolation inside the bucket holding the q-th observation
+        if not self.count:
+            return None
+        rank, seen = q * self.count, 0
+        for i, c in enumerate(self.counts):
+            if c and seen + c >= rank:
+                low = self.bounds[i - 1] if i else 0.0
+                high = self.bounds[i] if i < len(self.bounds) else low
+                return low + (high - low) * (rank - seen) / c
+            seen += c
+        return self.bounds[-1]
+
+    def to_dict(self):
+        return {"count": self.count, "sum": self.sum, "buckets": list(self.counts),
+                "mean": self.sum / self.count if self.count else None,
+                "p50": self.quantile(0.5), "p95": self.quantile(0.95), "p99": self.quantile(0.99)}
+
+class Metrics:
+    # Process-wide counters and histograms for the scraping and analysis hot paths.
+    # Cheap enough to stay on: one lock and a bucket scan per observation.
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+        self.collectors = []
+        self.started = time.time()
+
+    def inc(self, name, value=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def observe(self, name, seconds, n=1):
+        with self.lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.observe(seconds, n)
+
+    @contextmanager
+    def timer(self, name, n=1):
+        # Times the block; with n > 1 the time is recorded as n equal shares
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            if n:
+                self.observe(name, (time.perf_counter() - start) / n, n)
+
+    def add_collector(self, collect):
+        # `collect()` returns {name: value} gauges read at export time, for
+        # components that already keep their own counts
+        self.collectors.append(collect)
+
+    def snapshot(self):
+        gauges = {}
+        for collect in self.collectors:
+            gauges.update(collect())
+        with self.lock:
+            return {
+                "uptime_seconds": time.time() - self.started,
+                "counters": dict(self.counters),
+                "gauges": gauges,
+                "histograms": {name: h.to_dict() for name, h in self.histograms.items()},
+            }
+
+    def drain(self):
+        # Raw counts since the last drain, for shipping out of a worker process
+        with self.lock:
+            counters, histograms = self.counters, self.histograms
+            self.counters, self.histograms = {}, {}
+        return counters, {name: (h.counts, h.sum) for name, h in histograms.items()}
+
+    def merge(self, drained):
+        counters, histograms = drained
+        with self.lock:
+            for name, value in counters.items():
+                self.counters[name] = self.counters.get(name, 0) + value
+            for name, (counts, total) in histograms.items():
+                histogram = self.histograms.get(name)
+                if histogram is None:
+                    histogram = self.histograms[name] = Histogram()
+                histogram.counts = [a + b for a, b in zip(histogram.counts, counts)]
+                histogram.sum += total
+                histogram.count += sum(counts)
+
+    def reset(self):
+        with self.lock:
+            self.counters, self.histograms = {}, {}
+            self.started = time.time()
+
+    def to_json(self):
+        return json.dumps(self.snapshot(), indent=2)
+
+    def to_prometheus(self, prefix=METRICS_PREFIX):
+        # Prometheus text exposition format (version 0.0.4)
+        snapshot = self.snapshot()
+        lines = []
+
+        def header(name, kind):
+            help_text = METRIC_HELP.get(name)
+            if help_text:
+                lines.append(f"# HELP {prefix}{name} {help_text}")
+            lines.append(f"# TYPE {prefix}{name} {kind}")
+
+        for name, value in sorted(snapshot["counters"].items()):
+            header(name, "counter")
+            lines.append(f"{prefix}{name} {value}")
+        for name, value in sorted(snapshot["gauges"].items()):
+            header(name, "gauge")
+            lines.append(f"{prefix}{name} {value}")
+        for name, h in sorted(snapshot["histograms"].items()):
+            header(name, "histogram")
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS + ("+Inf",), h["buckets"]):
+                cumulative += count
+                lines.append(f'{prefix}{name}_bucket{{le="{bound}"}} {cumulative}')
+            lines.append(f"{prefix}{name}_sum {h['sum']}")
+            lines.append(f"{prefix}{name}_count {h['count']}")
+        return "\n".join(lines) + "\n"
+
+METRICS = Metrics()
+
+def stage_table(snapshot):
+    # One row per histogram, for printing or showing as a DataFrame
+    rows = []
+    for name, h in sorted(snapshot["histograms"].items()):
+        rows.append({"Stage": name, "Count": h["count"], "Total s": h["sum"],
+                     "Mean ms": h["mean"] * 1000 if h["mean"] is not None else None,
+                     "p50 ms": h["p50"] * 1000 if h["p50"] is not None else None,
+                     "p95 ms": h["p95"] * 1000 if h["p95"] is not None else None})
+    return rows
+
+# ---------- Export ----------
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        path = self.path.split("?")[0]
+        if path == "/metrics":
+            body, kind = METRICS.to_prometheus(), "text/plain; version=0.0.4"
+        elif path == "/metrics.json":
+            body, kind = METRICS.to_json(), "application/json"
+        else:
+            self.send_error(404)
+            return
+        data = body.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", kind)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+def serve_metrics(port, host="127.0.0.1"):
+    # /metrics (Prometheus text) and /metrics.json on a daemon thread
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+# ---------- Profiling ----------
+@contextmanager
+def profiled(path=None, top=PROFILE_TOP):
+    # Opt-in cProfile capture of the calling thread. Yields a dict whose "report"
+    # is filled with the top functions by cumulative time; with `path` the raw
+    # stats are also written there for snakeviz or pstats.
+    profile = cProfile.Profile()
+    result = {"report": None, "path": path}
+    profile.enable()
+    try:
+        yield result
+    finally:
+        profile.disable()
+        if path:
+            profile.dump_stats(path)
+        out = io.StringIO()
+        pstats.Stats(profile, stream=out).sort_stats("cumulative").print_stats(top)
+        result["report"] = out.getvalue()
@@ -0,0 +1,265 @@
+import os
+import time
+import queue
+import threading
+
+import pandas as pd
+
+from absa import AspectAggregator, AspectCounts, ParallelAnalyzer, ANALYSIS_WORKERS
+from estimate import PageSampleEstimator
+from ingest import CHUNK_ROWS, PAIR_SCHEMA, REVIEW_SCHEMA, ParquetSpool, pairs_table, reviews_table
+from scraper import Deadline, ProgressEvent, ScrapeStopped, iter_trustpilot
+
+def prefetch(iterable, maxsize=0, deadline=None):
+    # Drains `iterable` on a background thread so the consumer overlaps with it;
+    # `maxsize` bounds how far it may run ahead. With a `deadline` the consumer
+    # gets ScrapeStopped once it expires, even if the producer is stuck mid-item.
+    items = queue.Queue(maxsize)
+    stop = threading.Event()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def produce():
+        try:
+            for item in iterable:
+                if stop.is_set() or not put((True, item)):
+                    return
+        except Exception as e:
+            put((False, e))
+        else:
+            put((False, None))
+
+    worker = threading.Thread(target=produce, daemon=True)
+    worker.start()
+    try:
+        while True:
+            try:
+                ok, item = items.get(timeout=0.1 if deadline else None)
+            except queue.Empty:
+                deadline.check()
+                continue
+            if not ok:
+                if item is not None:
+                    raise item
+                return
+            yield item
+    finally:
+        stop.set()
+
+def timed(iterable, stats, key):
+    # Adds the time spent producing each item to stats[key]
+    stats.setdefault(key, 0.0)
+    iterator = iter(iterable)
+    while True:
+        start = time.perf_counter()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            stats[key] += time.perf_counter() - start
+            return
+        stats[key] += time.perf_counter() - start
+        yield item
+
+def run_pipeline(domain, store=None, on_update=None, on_progress=None,
+                 analysis_workers=ANALYSIS_WORKERS, stats=None, cache=None, timeout=None, cancel=None,
+                 sentiment=None, tagger=None, **scrape_kwargs):
+    # Scraping runs ahead on a background thread while each page is analyzed here.
+    # `on_update` gets the growing aggregate and the list of reviews so far;
+    # `on_progress` gets every ProgressEvent, always on the calling thread. `stats`
+    # is filled with pages, reviews and seconds per stage. With an AnalysisCache,
+    # unchanged reviews skip tagging. Scraping stops after `timeout` seconds or
+    # once the `cancel` event is set; whatever was gathered is still analyzed and
+    # stats["partial"] says so. `sentiment` and `tagger` name the analysis backends.
+    stats = stats if stats is not None else {}
+    deadline = Deadline(timeout, cancel)
+    started = time.perf_counter()
+    aggregator = AspectAggregator(cache=cache, sentiment=sentiment, tagger=tagger)
+    all_reviews = []
+    events = queue.SimpleQueue()
+
+    def dispatch():
+        # Relay scraper events from the background thread to the caller's thread
+        while not events.empty():
+            event = events.get()
+            if on_progress:
+                on_progress(event)
+
+    def analyzed():
+        dispatch()
+        if on_progress:
+            on_progress(ProgressEvent("analyze", len(aggregator.aspect_table), len(all_reviews)))
+
+    stats["analyze_seconds"] = 0.0
+    pages = iter_trustpilot(domain, store=store, stats=stats, progress=events.put, deadline=deadline,
+                            **scrape_kwargs)
+    with ParallelAnalyzer(aggregator, workers=analysis_workers) as analyzer:
+        try:
+            for reviews in prefetch(timed(pages, stats, "scrape_seconds"), deadline=deadline):
+                all_reviews.extend(reviews)
+                t = time.perf_counter()
+                analyzer.add(r["review"] for r in reviews)
+                stats["analyze_seconds"] += time.perf_counter() - t
+                analyzed()
+                if on_update:
+                    on_update(aggregator, all_reviews)
+        except ScrapeStopped as e:
+            # The scraper thread was stuck past the deadline; analyze what arrived,
+            # plus any stored reviews it hadn't handed over yet
+            stats.update(partial=True, stop_reason=str(e))
+            if store:
+                seen = {r["review_id"] for r in all_reviews}
+                stored = [r for r in store.load(domain.strip()).to_dict("records") if r["review_id"] not in seen]
+                if stored:
+                    all_reviews.extend(stored)
+                    analyzer.add(r["review"] for r in stored)
+                    analyzed()
+        t = time.perf_counter()
+        analyzer.finish()
+        stats["analyze_seconds"] += time.perf_counter() - t
+    analyzed()
+    stats["reviews"] = len(all_reviews)
+    stats["aspects"] = len(aggregator.aspect_table.aspects)
+    if cache:
+        # Lookups made inside analysis worker processes are not counted here
+        stats["analysis_cache"] = cache.stats()
+    stats["total_seconds"] = time.perf_counter() - started
+    return pd.DataFrame(all_reviews), aggregator.summary(), aggregator.aspect_table
+
+def run_chunked(domain, out_dir, chunk_rows=CHUNK_ROWS, on_progress=None, stats=None, cache=None,
+                timeout=None, cancel=None, sentiment=None, tagger=None, analysis_workers=ANALYSIS_WORKERS,
+                **scrape_kwargs):
+    # Out-of-core run_pipeline for very large domains. Scraped reviews are spooled
+    # to out_dir/reviews.parquet in row groups of `chunk_rows`; each chunk is
+    # analyzed on its own, its pairs spooled to out_dir/pairs.parquet and its
+    # counts folded into an AspectCounts; a chunk is sharded over the shared
+    # analysis pool like run_pipeline's pages. Only one chunk of reviews and the
+    # per-aspect counts are ever held in memory. The review store isn't used,
+    # since loading it means reading the whole domain. Returns
+    # (reviews_path, summary, pairs_path).
+    stats = stats if stats is not None else {}
+    deadline = Deadline(timeout, cancel)
+    started = time.perf_counter()
+    os.makedirs(out_dir, exist_ok=True)
+    reviews_path = os.path.join(out_dir, "reviews.parquet")
+    pairs_path = os.path.join(out_dir, "pairs.parquet")
+    counts = AspectCounts()
+    chunk = []
+    events = queue.SimpleQueue()
+
+    def dispatch():
+        while not events.empty():
+            event = events.get()
+            if on_progress:
+                on_progress(event)
+
+    def flush():
+        t = time.perf_counter()
+        first = review_spool.rows
+        review_spool.write(reviews_table(chunk))
+        aggregator = AspectAggregator(cache=cache, sentiment=sentiment, tagger=tagger)
+        with ParallelAnalyzer(aggregator, workers=analysis_workers) as analyzer:
+            analyzer.add(r["review"] for r in chunk)
+        pair_spool.write(pairs_table(aggregator.aspect_table, first))
+        counts.merge(aggregator.aspect_table)
+        chunk.clear()
+        stats["analyze_seconds"] += time.perf_counter() - t
+        stats["chunks"] += 1
+        dispatch()
+        if on_progress:
+            on_progress(ProgressEvent("analyze", review_spool.rows, review_spool.rows))
+
+    stats.update(analyze_seconds=0.0, chunks=0)
+    pages = iter_trustpilot(domain, stats=stats, progress=events.put, deadline=deadline, **scrape_kwargs)
+    with ParquetSpool(reviews_path, REVIEW_SCHEMA) as review_spool, \
+            ParquetSpool(pairs_path, PAIR_SCHEMA) as pair_spool:
+        try:
+            # A bounded read-ahead, so a fast scraper can't pile pages up in memory
+            for reviews in prefetch(timed(pages, stats, "scrape_seconds"), maxsize=8, deadline=deadline):
+                chunk.extend(reviews)
+                dispatch()
+                if len(chunk) >= chunk_rows:
+                    flush()
+        except ScrapeStopped as e:
+            stats.update(partial=True, stop_reason=str(e))
+        if chunk:
+            flush()
+    dispatch()
+    stats["reviews"] = review_spool.rows
+    stats["aspects"] = len(counts.aspects)
+    stats["total_seconds"] = time.perf_counter() - started
+    return reviews_path, counts.summary(), pairs_path
+
+def run_estimate(domain, max_pages=None, max_seconds=None, on_estimate=None, on_progress=None,
+                 seed=None, stats=None, cache=None, cancel=None, sentiment=None, tagger=None, **scrape_kwargs):
+    # Fast estimate: scrapes pages in stratified random order and refines a sampled
+    # estimate after each one, until the page or time budget runs out or every
+    # page is in. `on_estimate` gets (df, summary, aspect_table, estimate) after
+    # each page, so a caller can accept the estimate at any point. The time budget
+    # and `cancel` also cut short requests in flight.
+    stats = stats if stats is not None else {}
+    deadline = Deadline(max_seconds, cancel)
+    started = time.perf_counter()
+    aggregator = AspectAggregator(cache=cache, sentiment=sentiment, tagger=tagger)
+    estimator = PageSampleEstimator()
+    all_reviews = []
+    events = queue.SimpleQueue()
+
+    def dispatch():
+        while not events.empty():
+            event = events.get()
+            if event.stage == "scrape" and event.total:
+                estimator.total_pages = event.total
+            if on_progress:
+                on_progress(event)
+
+    def result(complete):
+        if complete:
+            # Every page that could be read is in, so there is nothing left to estimate
+            estimator.total_pages = estimator.pages
+        estimate = estimator.summary(aggregator.aspect_table.aspects)
+        estimate["complete"] = complete
+        return pd.DataFrame(all_reviews), aggregator.summary(), aggregator.aspect_table, estimate
+
+    stats["analyze_seconds"] = 0.0
+    # The scraper's own counters run ahead of the estimate, so they stay separate
+    scrape_stats = {}
+    pages = iter_trustpilot(domain, stats=scrape_stats, progress=events.put, sample=True, seed=seed,
+                            deadline=deadline, **scrape_kwargs)
+    complete = True
+    # Read ahead by one page only: pages past the budget would be fetched for nothing
+    batches = prefetch(timed(pages, stats, "scrape_seconds"), maxsize=1, deadline=deadline)
+    try:
+        for reviews in batches:
+            dispatch()
+            start = len(aggregator.aspect_table)
+            all_reviews.extend(reviews)
+            t = time.perf_counter()
+            aggregator.add(r["review"] for r in reviews)
+            stats["analyze_seconds"] += time.perf_counter() - t
+            estimator.add_page(aggregator.aspect_table, start, len(aggregator.aspect_table))
+            if on_progress:
+                on_progress(ProgressEvent("analyze", len(aggregator.aspect_table), len(all_reviews)))
+            if on_estimate:
+                on_estimate(*result(False))
+            if ((max_pages and estimator.pages >= max_pages)
+                    or (max_seconds and time.perf_counter() - started >= max_seconds)):
+                complete = estimator.complete
+                break
+    except ScrapeStopped:
+        complete = estimator.complete
+    finally:
+        batches.close()
+    if scrape_stats.get("partial"):
+        complete = estimator.complete
+    dispatch()
+    stats["reviews"] = len(all_reviews)
+    stats["pages"] = estimator.pages
+    stats["total_seconds"] = time.perf_counter() - started
+    return result(complete)
@@ -0,0 +1,111 @@
+import re
+import sqlite3
+import time
+import hashlib
+from contextlib import closing
+
+import pandas as pd
+
+REVIEW_COLUMNS = ["rating", "title", "review", "date", "review_id"]
+
+ISO_DATE_RE = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+
+def review_identity(review):
+    # Content plus the publication date, so identical short reviews ("Great service")
+    # posted on different days stay distinct. A relative badge date ("2 days ago")
+    # changes between scrapes, so it is left out of the hash.
+    fields = ["rating", "title", "review"]
+    if ISO_DATE_RE.match(str(review.get("date", ""))):
+        fields.append("date")
+    key = "\x1f".join(str(review.get(k, "")) for k in fields)
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+
+def dedupe_reviews(reviews, known_ids=()):
+    # Drop reviews already stored or repeated because they shifted across pages mid-scrape
+    seen, unique = set(known_ids), []
+    for r in reviews:
+        if r["review_id"] not in seen:
+            seen.add(r["review_id"])
+            unique.append(r)
+    return unique
+
+class ReviewStore:
+    # SQLite-backed review cache keyed by (domain, review_id), plus where each
+    # domain's interrupted crawl should resume
+    def __init__(self, path="reviews.db"):
+        self.path = path
+        with closing(self._connect()) as conn, conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS reviews (
+                    domain TEXT NOT NULL,
+                    review_id TEXT NOT NULL,
+                    rating TEXT,
+                    title TEXT,
+                    review TEXT,
+                    date TEXT,
+                    scraped_at REAL NOT NULL,
+                    position INTEGER NOT NULL,
+                    PRIMARY KEY (domain, review_id)
+                )
+            """)
+            # Where an interrupted crawl stopped: the stored reviews are a contiguous
+            # newest-first prefix, and resume_page is the first page not yet fetched
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS crawl_state (
+                    domain TEXT PRIMARY KEY,
+                    resume_page INTEGER NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            """)
+
+    def _connect(self):
+        # One short-lived connection per call, so Streamlit's script threads never share one
+        return sqlite3.connect(self.path, timeout=30)
+
+    def add_reviews(self, domain, reviews, older=False):
+        # `reviews` is newest-first; a later scrape sorts ahead of everything stored
+        # before it, unless the reviews are `older` (a resumed crawl's backfill), which
+        # sort after everything stored
+        now, first = time.time(), 0
+        with closing(self._connect()) as conn, conn:
+            if older:
+                oldest = conn.execute("SELECT MIN(scraped_at) FROM reviews WHERE domain = ?",
+                                      (domain,)).fetchone()[0]
+                if oldest is not None:
+                    last = conn.execute("SELECT MAX(position) FROM reviews WHERE domain = ? AND scraped_at = ?",
+                                        (domain, oldest)).fetchone()[0]
+                    now, first = oldest, last + 1
+            rows = [(domain, r["review_id"], r.get("rating", ""), r.get("title", ""),
+                     r.get("review", ""), r.get("date", ""), now, first + i)
+                    for i, r in enumerate(reviews)]
+            cur = conn.executemany(
+                "INSERT OR IGNORE INTO reviews VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            return cur.rowcount
+
+    def load(self, domain):
+        with closing(self._connect()) as conn:
+            return pd.read_sql_query(
+                f"SELECT {', '.join(REVIEW_COLUMNS)} FROM reviews WHERE domain = ? "
+                "ORDER BY scraped_at DESC, position ASC",
+                conn, params=(domain,))
+
+    def resume_page(self, domain):
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT resume_page FROM crawl_state WHERE domain = ?", (domain,)).fetchone()
+            return row[0] if row else None
+
+    def set_resume_page(self, domain, page):
+        # None marks the domain's stored reviews as complete
+        with closing(self._connect()) as conn, conn:
+            if page is None:
+                conn.execute("DELETE FROM crawl_state WHERE domain = ?", (domain,))
+            else:
+                conn.execute("INSERT OR REPLACE INTO crawl_state VALUES (?, ?, ?)", (domain, page, time.time()))
+
+    def clear(self, domain=None):
+        with closing(self._connect()) as conn, conn:
+            for table in ("reviews", "crawl_state"):
+                if domain is None:
+                    conn.execute(f"DELETE FROM {table}")
+                else:
+                    conn.execute(f"DELETE FROM {table} WHERE domain = ?", (domain,))
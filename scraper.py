@@ -0,0 +1,512 @@
+import re
+import json
+import time
+import random
+import threading
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from collections import namedtuple, deque
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import requests
+from bs4 import BeautifulSoup, SoupStrainer
+from requests.adapters import HTTPAdapter
+
+from metrics import METRICS
+from review_store import review_identity, dedupe_reviews
+
+# ---------- Fetching ----------
+TRUSTPILOT_BASE = "https://www.trustpilot.com/review/"
+HEADERS = {"User-Agent": "Mozilla/5.0"}
+SCRAPE_WORKERS = 8           # concurrent page fetches
+SCRAPE_RATE_LIMIT = 4.0      # starting requests per second across all workers
+SCRAPE_MAX_RATE = 12.0       # ceiling the rate may climb to while responses are healthy
+SCRAPE_MIN_RATE = 0.5        # floor it may be cut to when throttled
+SCRAPE_RATE_STEP = 1.0       # additive increase, in requests/s per second of healthy responses
+SCRAPE_RETRIES = 4           # retries per page for throttling, 5xx and network errors
+SCRAPE_TIMEOUT = (5.0, 20.0)  # connect and read timeouts per request, in seconds
+BACKOFF_BASE = 0.5
+BACKOFF_CAP = 30.0
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+class ScrapeError(Exception):
+    # A page still failed after every retry
+    pass
+
+class ScrapeStopped(Exception):
+    # The crawl's deadline passed or it was cancelled
+    pass
+
+class Deadline:
+    # An overall time budget plus cooperative cancellation, shared by every
+    # thread of a crawl: waits and request timeouts are cut short to fit it
+    def __init__(self, seconds=None, cancel=None):
+        self.expires = time.monotonic() + seconds if seconds else None
+        self.cancel = cancel or threading.Event()
+
+    def remaining(self):
+        return None if self.expires is None else max(0.0, self.expires - time.monotonic())
+
+    def expired(self):
+        return self.cancel.is_set() or (self.expires is not None and time.monotonic() >= self.expires)
+
+    def reason(self):
+        return "cancelled" if self.cancel.is_set() else "deadline"
+
+    def check(self):
+        if self.expired():
+            raise ScrapeStopped(self.reason())
+
+    def sleep(self, seconds):
+        # Wakes early on cancel; raises ScrapeStopped if the crawl must end
+        remaining = self.remaining()
+        self.cancel.wait(seconds if remaining is None else min(seconds, remaining))
+        self.check()
+
+    def timeout(self, timeout=SCRAPE_TIMEOUT):
+        remaining = self.remaining()
+        if remaining is None:
+            return timeout
+        return tuple(max(min(t, remaining), 0.1) for t in timeout)
+
+class RateLimiter:
+    # Spaces calls out across all threads and adapts the rate AIMD-style: every
+    # healthy response adds SCRAPE_RATE_STEP / rate (about STEP per second) up to
+    # max_rate; a 429 or 5xx halves it, at most once per second, down to min_rate.
+    # Retry-After pauses every caller. A rate of 0 means unlimited.
+    def __init__(self, rate, max_rate=SCRAPE_MAX_RATE, min_rate=SCRAPE_MIN_RATE):
+        self.rate = rate if rate and rate > 0 else 0.0
+        self.max_rate = max(max_rate or 0.0, self.rate)
+        self.min_rate = min(min_rate, self.rate)
+        self.lock = threading.Lock()
+        self.next_slot = 0.0
+        self.hold_until = 0.0
+        self.counts = {"requests": 0, "ok": 0, "throttled": 0, "server_errors": 0,
+                       "network_errors": 0, "retries": 0, "gave_up": 0}
+        self.wait_seconds = 0.0
+        self.retry_after_seconds = 0.0
+        self.peak_rate = self.low_rate = self.rate
+
+    def wait(self, deadline=None):
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot)
+            self.next_slot = slot + (1.0 / self.rate if self.rate else 0.0)
+            self.counts["requests"] += 1
+            self.wait_seconds += slot - now
+        delay = slot - now
+        if delay > 0:
+            if deadline:
+                deadline.sleep(delay)
+            else:
+                time.sleep(delay)
+
+    def success(self):
+        with self.lock:
+            self.counts["ok"] += 1
+            if self.rate and self.rate < self.max_rate:
+                self.rate = min(self.max_rate, self.rate + SCRAPE_RATE_STEP / self.rate)
+                self.peak_rate = max(self.peak_rate, self.rate)
+
+    def failure(self, kind, retry_after=None):
+        # `kind` is "throttled", "server_errors" or "network_errors"
+        with self.lock:
+            self.counts[kind] += 1
+            now = time.monotonic()
+            if kind != "network_errors" and self.rate and now >= self.hold_until:
+                # Responses already in flight were sent at the old rate; cut once per second
+                self.rate = max(self.min_rate, self.rate / 2)
+                self.low_rate = min(self.low_rate, self.rate)
+                self.hold_until = now + 1.0
+            if retry_after:
+                self.next_slot = max(self.next_slot, now + retry_after)
+                self.retry_after_seconds += retry_after
+
+    def count(self, key):
+        with self.lock:
+            self.counts[key] += 1
+
+    def stats(self):
+        with self.lock:
+            return dict(self.counts, rate=self.rate, peak_rate=self.peak_rate, low_rate=self.low_rate,
+                        wait_seconds=self.wait_seconds, retry_after_seconds=self.retry_after_seconds)
+
+def make_session(pool_size=SCRAPE_WORKERS):
+    session = requests.Session()
+    session.headers.update(HEADERS)
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(pool_size, 1))
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+def parse_retry_after(value):
+    # Seconds, or an HTTP date; capped so one header can't stall a crawl indefinitely
+    if not value:
+        return None
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            seconds = (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds()
+        except (TypeError, ValueError):
+            return None
+    return min(max(seconds, 0.0), BACKOFF_CAP)
+
+def backoff_delay(attempt, retry_after=None):
+    # Full jitter: uniform over [0, base * 2^attempt], but never sooner than Retry-After
+    delay = random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+    return max(delay, retry_after or 0.0)
+
+def fetch_page(session, url, limiter=None, retries=SCRAPE_RETRIES, deadline=None):
+    # The page's HTML, or None for a page that doesn't exist (404 and other
+    # non-retryable statuses). Throttling, 5xx and network errors are retried
+    # with backoff; if they outlast the retries, ScrapeError is raised rather
+    # than letting the crawl end early as if the pages had run out. Every wait
+    # and timeout fits inside `deadline`, which raises ScrapeStopped.
+    limiter = limiter or RateLimiter(0)
+    deadline = deadline or Deadline()
+    error, retry_after = None, None
+    for attempt in range(retries + 1):
+        deadline.check()
+        if attempt:
+            limiter.count("retries")
+            deadline.sleep(backoff_delay(attempt - 1, retry_after))
+        limiter.wait(deadline)
+        METRICS.inc("scrape_requests_total")
+        started = time.perf_counter()
+        try:
+            response = session.get(url, timeout=deadline.timeout())
+        except requests.RequestException as e:
+            limiter.failure("network_errors")
+            error, retry_after = f"{type(e).__name__}: {e}", None
+            continue
+        METRICS.observe("scrape_request_seconds", time.perf_counter() - started)
+        METRICS.inc("scrape_bytes_total", len(response.content))
+        if response.status_code == 200:
+            limiter.success()
+            return response.text
+        if response.status_code not in RETRY_STATUSES:
+            return None
+        retry_after = parse_retry_after(response.headers.get("Retry-After"))
+        limiter.failure("throttled" if response.status_code == 429 else "server_errors", retry_after)
+        error = f"HTTP {response.status_code}"
+    limiter.count("gave_up")
+    raise ScrapeError(f"{url}: {error} after {retries + 1} attempts")
+
+def page_url(base, page):
+    # Newest-first ordering makes the incremental walk's stopping point meaningful
+    return f"{base}?sort=recency&page={page}"
+
+# ---------- Parsing ----------
+NEXT_DATA_RE = re.compile(r'<script[^>]*id="__NEXT_DATA__"[^>]*>(.*?)</script>', re.S)
+REVIEW_SECTION = SoupStrainer("section", class_=re.compile(r"^styles_reviewContentwrapper"))
+PAGINATION_LINKS = SoupStrainer("a", attrs={"name": re.compile(r"^pagination-button-")})
+
+def extract_next_data(html):
+    # Trustpilot is a Next.js app; the page props hold the same reviews the DOM renders
+    m = NEXT_DATA_RE.search(html)
+    if not m:
+        return None
+    try:
+        return json.loads(m.group(1)).get("props", {}).get("pageProps", {})
+    except ValueError:
+        return None
+
+def parse_next_data_reviews(page_props):
+    reviews = []
+    for r in page_props.get("reviews") or []:
+        rev = (r.get("text") or "").strip()
+        if not rev:
+            continue
+        published = (r.get("dates") or {}).get("publishedDate") or ""
+        reviews.append({
+            "rating": str(r.get("rating") or ""),
+            "title": (r.get("title") or "").strip(),
+            "review": rev,
+            "date": published[:10],
+            "review_id": r.get("id") or "",
+        })
+    for review in reviews:
+        review["review_id"] = review["review_id"] or review_identity(review)
+    return reviews
+
+def parse_review_sections(html):
+    # Fallback: only build the review sections, with lxml instead of html.parser
+    soup = BeautifulSoup(html, "lxml", parse_only=REVIEW_SECTION)
+    sections = soup.find_all("section")
+    reviews = []
+    for s in sections:
+        h2, p = s.find("h2"), s.find("p")
+        title = h2.get_text(strip=True) if h2 else ""
+        rev = p.get_text(strip=True) if p else ""
+        # The badge's <time datetime> is absolute ISO; its text may be relative ("2 days ago")
+        badge = s.find("div", {"data-testid": "review-badge-date"})
+        time_tag = badge.find("time", datetime=True) if badge else None
+        date = time_tag["datetime"][:10] if time_tag else badge.get_text(strip=True) if badge else ""
+        rating_div = s.find("div", {"data-service-review-rating": True})
+        rating = rating_div["data-service-review-rating"] if rating_div else ""
+        if rev:
+            review = {"rating": rating, "title": title, "review": rev, "date": date}
+            review["review_id"] = review_identity(review)
+            reviews.append(review)
+    return reviews, bool(sections)
+
+def parse_review_page(html):
+    with METRICS.timer("parse_page_seconds"):
+        page_props = extract_next_data(html)
+        if page_props and "reviews" in page_props:
+            reviews = page_props["reviews"] or []
+            return parse_next_data_reviews(page_props), bool(reviews)
+        return parse_review_sections(html)
+
+def parse_last_page(html):
+    page_props = extract_next_data(html)
+    pagination = ((page_props or {}).get("filters") or {}).get("pagination") or {}
+    if pagination.get("totalPages"):
+        return int(pagination["totalPages"])
+
+    # Trustpilot's pagination links carry the page number in ?page=N
+    links = BeautifulSoup(html, "lxml", parse_only=PAGINATION_LINKS).find_all("a")
+    last = [a for a in links if a.get("name") == "pagination-button-last"]
+    pages = []
+    for a in last or links:
+        m = re.search(r"[?&]page=(\d+)", a.get("href") or "")
+        if m:
+            pages.append(int(m.group(1)))
+        elif a.get_text(strip=True).isdigit():
+            pages.append(int(a.get_text(strip=True)))
+    return max(pages) if pages else None
+
+# ---------- Crawling ----------
+# Progress callbacks receive ProgressEvent(stage, done, total): for "scrape" the
+# units are pages (total is None while the last page is unknown), for "analyze"
+# they are reviews analyzed out of reviews scraped so far
+ProgressEvent = namedtuple("ProgressEvent", ["stage", "done", "total"])
+
+def _no_progress(event):
+    pass
+
+def iter_pages(base, session, limiter, workers, progress, deadline=None, first_page=1):
+    # Yields each page's reviews in page order as soon as that page is available,
+    # from `first_page` (every page reports the page count) to the last
+    first = fetch_page(session, page_url(base, first_page), limiter, deadline=deadline)
+    if first is None:
+        return
+    reviews, found = parse_review_page(first)
+    last_page = parse_last_page(first) if found else None
+    progress(ProgressEvent("scrape", first_page, last_page))
+    yield reviews
+    if not found:
+        return
+    if workers > 1 and last_page:
+        # Fetch pages 2..last concurrently, but hand them out in page order. Only a
+        # window of pages is in flight, so fetched HTML never piles up in memory.
+        pool = ThreadPoolExecutor(max_workers=workers)
+        pending = deque()
+        next_page = first_page + 1
+        try:
+            while pending or next_page <= last_page:
+                while next_page <= last_page and len(pending) < 2 * workers:
+                    pending.append((next_page, pool.submit(
+                        fetch_page, session, page_url(base, next_page), limiter, deadline=deadline)))
+                    next_page += 1
+                p, future = pending.popleft()
+                html = future.result()
+                # Keep the sequential semantics: stop at the first failed or empty page
+                if html is None:
+                    break
+                reviews, found = parse_review_page(html)
+                if not found:
+                    break
+                progress(ProgressEvent("scrape", p, last_page))
+                yield reviews
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+    else:
+        page = first_page + 1
+        while True:
+            html = fetch_page(session, page_url(base, page), limiter, deadline=deadline)
+            if html is None:
+                break
+            reviews, found = parse_review_page(html)
+            if not found:
+                break
+            progress(ProgressEvent("scrape", page, None))
+            yield reviews
+            page += 1
+
+def iter_new_pages(base, session, limiter, known_ids, progress, deadline=None):
+    # Walk newest-first and stop at the first page made up entirely of stored reviews
+    page = 1
+    while True:
+        html = fetch_page(session, page_url(base, page), limiter, deadline=deadline)
+        if html is None:
+            break
+        reviews, found = parse_review_page(html)
+        fresh = dedupe_reviews(reviews, known_ids)
+        if not found or not fresh:
+            break
+        known_ids.update(r["review_id"] for r in fresh)
+        progress(ProgressEvent("scrape", page, None))
+        yield reviews
+        page += 1
+
+def stratified_order(first, last, seed=None):
+    # Every page in first..last, ordered so that any prefix is spread over the whole
+    # range: one random page from each of 1, 2, 4, ... equal strata in turn. Pages
+    # are sorted by recency, so this spreads an early stop evenly over time.
+    rng = random.Random(seed)
+    pages = list(range(first, last + 1))
+    taken, order = set(), []
+    strata = 1
+    while len(order) < len(pages):
+        size = len(pages) / strata
+        level = []
+        for s in range(strata):
+            stratum = [p for p in pages[int(s * size):int((s + 1) * size)] if p not in taken]
+            if stratum:
+                page = rng.choice(stratum)
+                taken.add(page)
+                level.append(page)
+        rng.shuffle(level)
+        order.extend(level)
+        strata *= 2
+    return order
+
+def iter_sampled_pages(base, session, limiter, workers, progress, seed=None, deadline=None):
+    # Page 1 (which gives the page count), then every other page in stratified
+    # random order, for estimates that can stop early. A failed or empty page is
+    # skipped, even one that failed every retry, rather than ending the crawl.
+    # Without a page count there is nothing to stratify, so the remaining pages
+    # are walked in order as iter_pages does.
+    first = fetch_page(session, page_url(base, 1), limiter, deadline=deadline)
+    if first is None:
+        return
+    reviews, found = parse_review_page(first)
+    last_page = parse_last_page(first) if found else None
+    progress(ProgressEvent("scrape", 1, last_page))
+    yield reviews
+    if not found:
+        return
+    if not last_page:
+        yield from iter_pages(base, session, limiter, workers, progress, deadline, first_page=2)
+        return
+    # Only one fetch per worker runs ahead, so stopping early wastes little
+    workers = max(workers, 1)
+    order = iter(stratified_order(2, last_page, seed))
+    pending = deque()
+    pool = ThreadPoolExecutor(max_workers=workers)
+    try:
+        done = 1
+        while True:
+            while len(pending) < workers:
+                page = next(order, None)
+                if page is None:
+                    break
+                pending.append(pool.submit(fetch_page, session, page_url(base, page), limiter, deadline=deadline))
+            if not pending:
+                break
+            try:
+                html = pending.popleft().result()
+            except ScrapeError:
+                html = None
+            done += 1
+            reviews, found = parse_review_page(html) if html is not None else ([], False)
+            progress(ProgressEvent("scrape", done, last_page))
+            if found:
+                yield reviews
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+def iter_trustpilot(domain, workers=SCRAPE_WORKERS, rate_limit=SCRAPE_RATE_LIMIT, store=None,
+                    progress=None, limiter=None, stats=None, base_url=TRUSTPILOT_BASE,
+                    sample=False, seed=None, max_rate=SCRAPE_MAX_RATE, deadline=None):
+    # Yields batches of new, deduplicated reviews; with a store, the already-stored
+    # reviews follow the newest pages so the stream always covers the whole domain.
+    # Pass one `limiter` to several concurrent crawls to share a global rate, and
+    # `base_url` to crawl a local stand-in instead of trustpilot.com. With `sample`,
+    # pages come in stratified random order (see iter_sampled_pages). When the
+    # `deadline` passes, it is cancelled, or a page fails every retry, the crawl
+    # ends early with stats["partial"] set and the reason in stats["stop_reason"].
+    # A store keeps the contiguous newest-first pages such a crawl did fetch, with
+    # the page it stopped at; the next crawl walks the newest pages as usual and
+    # then resumes the older ones from there.
+    domain = domain.strip()
+    base = f"{base_url}{domain}"
+    progress = progress or _no_progress
+    stats = stats if stats is not None else {}
+    session = make_session(workers)
+    limiter = limiter or RateLimiter(rate_limit, max_rate)
+    deadline = deadline or Deadline()
+    if sample:
+        # A partial sample would leave gaps the incremental walk can't detect
+        store = None
+    stored = store.load(domain) if store else pd.DataFrame([])
+    seen = set(stored["review_id"]) if not stored.empty else set()
+    resume = store.resume_page(domain) if store and seen else None
+    # Phases run in order: "full" crawls a domain from page 1, "newest" walks down to
+    # the stored reviews, "older" continues an interrupted crawl below them
+    if sample:
+        phases = [("sample", iter_sampled_pages(base, session, limiter, workers, progress, seed, deadline))]
+    elif seen:
+        phases = [("newest", iter_new_pages(base, session, limiter, set(seen), progress, deadline))]
+        if resume:
+            phases.append(("older", iter_pages(base, session, limiter, workers, progress, deadline, resume)))
+    else:
+        phases = [("full", iter_pages(base, session, limiter, workers, progress, deadline))]
+
+    # Only needed for the store; a streaming consumer keeps its own copy
+    collected = {name: [] for name, _ in phases}
+    phase_pages = dict.fromkeys(collected, 0)
+    phase = None
+    stored_sent = stored.empty
+    stats.update(pages=0, new_reviews=0, stored_reviews=len(stored), partial=False)
+    try:
+        for phase, pages in phases:
+            for reviews in pages:
+                deadline.check()
+                stats["pages"] += 1
+                phase_pages[phase] += 1
+                fresh = dedupe_reviews(reviews, seen)
+                seen.update(r["review_id"] for r in fresh)
+                if store:
+                    collected[phase].extend(fresh)
+                stats["new_reviews"] += len(fresh)
+                if fresh:
+                    yield fresh
+            if not stored_sent:
+                # Stored reviews sit between the newest pages and any older ones still to fetch
+                stored_sent = True
+                yield stored.to_dict("records")
+    except (ScrapeStopped, ScrapeError) as e:
+        # Keep everything gathered so far and say why the crawl ended early
+        stats.update(partial=True, stop_reason=str(e) if isinstance(e, ScrapeStopped) else f"error: {e}")
+    finally:
+        session.close()
+        # A limiter shared by several crawls reports on all of them
+        stats["throttle"] = limiter.stats()
+    progress(ProgressEvent("scrape", stats["pages"], stats["pages"]))
+
+    if store:
+        stopped_in = phase if stats["partial"] else None
+        if collected.get("full"):
+            # Pages 1..n in order: a prefix of the domain even when cut short
+            store.add_reviews(domain, collected["full"])
+            store.set_resume_page(domain, phase_pages["full"] + 1 if stopped_in == "full" else None)
+        if "newest" in collected and stopped_in != "newest":
+            # A cut-short walk would leave a gap above the stored reviews it could never see
+            store.add_reviews(domain, collected["newest"])
+        if "older" in collected and stopped_in != "newest":
+            store.add_reviews(domain, collected["older"], older=True)
+            store.set_resume_page(domain, resume + phase_pages["older"] if stopped_in == "older" else None)
+        stats["resume_page"] = store.resume_page(domain)
+    if not stored_sent:
+        yield stored.to_dict("records")
+
+def scrape_trustpilot(domain, workers=SCRAPE_WORKERS, rate_limit=SCRAPE_RATE_LIMIT, store=None, progress=None,
+                      base_url=TRUSTPILOT_BASE, stats=None):
+    all_reviews = []
+    for reviews in iter_trustpilot(domain, workers, rate_limit, store, progress, base_url=base_url, stats=stats):
+        all_reviews.extend(reviews)
+    return pd.DataFrame(all_reviews)
@@ -0,0 +1,81 @@
+import threading
+
+import pytest
+
+from absa import nltk_data_missing
+from benchmarks.corpus import synthetic_reviews
+from benchmarks.standin import StandIn
+from pipeline import run_pipeline
+from review_store import ReviewStore
+from scraper import Deadline, iter_trustpilot
+
+DOMAIN = "example.com"
+
+@pytest.fixture
+def store(tmp_path):
+    return ReviewStore(str(tmp_path / "reviews.db"))
+
+def crawl(standin, store, stop_after=None, workers=4):
+    # One store-backed crawl, cancelled once `stop_after` pages have come in
+    cancel, stats, pages = threading.Event(), {}, [0]
+
+    def progress(event):
+        if event.stage == "scrape":
+            pages[0] += 1
+            if stop_after and pages[0] >= stop_after:
+                cancel.set()
+
+    batches = iter_trustpilot(DOMAIN, workers=workers, rate_limit=0, store=store, base_url=standin.base_url,
+                              progress=progress, stats=stats, deadline=Deadline(None, cancel))
+    return [r["review_id"] for batch in batches for r in batch], stats
+
+def publish(standin, n, seed):
+    # n new reviews appear at the top of the domain, pushing every page down
+    new = [dict(r, review_id=f"new-{seed}-{i}") for i, r in enumerate(synthetic_reviews(n, seed=seed))]
+    standin.reviews[DOMAIN][:0] = new
+    standin.cache.clear()
+    standin.pages = -(-len(standin.reviews[DOMAIN]) // standin.per_page)
+
+def domain_ids(standin):
+    return [r["review_id"] for r in standin.reviews[DOMAIN]]
+
+@pytest.mark.parametrize("workers", [1, 4])
+def test_interrupted_crawl_resumes_to_a_complete_ordered_store(store, workers):
+    with StandIn(pages=30) as standin:
+        _, stats = crawl(standin, store, stop_after=8, workers=workers)
+        assert stats["partial"]
+        assert store.resume_page(DOMAIN) is not None
+        assert store.load(DOMAIN)["review_id"].tolist() == domain_ids(standin)[:len(store.load(DOMAIN))]
+
+        # New reviews shift every page while the crawl is still unfinished
+        publish(standin, 25, seed=99)
+        _, stats = crawl(standin, store, stop_after=6, workers=workers)
+        assert stats["partial"]
+
+        streamed, stats = crawl(standin, store, workers=workers)
+        assert not stats["partial"]
+        assert store.resume_page(DOMAIN) is None
+        assert store.load(DOMAIN)["review_id"].tolist() == domain_ids(standin)
+        assert streamed == domain_ids(standin)
+
+def test_complete_crawl_leaves_no_resume_page(store):
+    with StandIn(pages=5) as standin:
+        streamed, stats = crawl(standin, store)
+        assert not stats["partial"] and stats["resume_page"] is None
+        assert streamed == store.load(DOMAIN)["review_id"].tolist() == domain_ids(standin)
+
+        # A refresh with nothing new streams the stored reviews and changes nothing
+        streamed, stats = crawl(standin, store)
+        assert stats["new_reviews"] == 0
+        assert streamed == domain_ids(standin)
+
+@pytest.mark.skipif(nltk_data_missing(), reason="NLTK punkt/tagger data not installed")
+def test_stopped_refresh_still_analyzes_stored_reviews(store):
+    with StandIn(pages=10) as standin:
+        run_pipeline(DOMAIN, store=store, base_url=standin.base_url, rate_limit=0, analysis_workers=1)
+        # Every request now outlasts the deadline, so the stop lands mid-request
+        standin.latency = 0.5
+        for _ in range(3):
+            df, _, _ = run_pipeline(DOMAIN, store=store, timeout=0.3, base_url=standin.base_url, rate_limit=0,
+                                    analysis_workers=1)
+            assert df["review_id"].tolist() == domain_ids(standin)
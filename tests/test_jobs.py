@@ -0,0 +1,67 @@
+import threading
+
+import pytest
+
+from jobs import DONE, JobManager
+
+@pytest.fixture
+def manager():
+    manager = JobManager(workers=4)
+    yield manager
+    manager.shutdown()
+
+def until_cancelled(job):
+    # A job target that runs until its job is cancelled
+    job.cancel.wait(5)
+    return "stopped" if job.cancel.is_set() else "timed out"
+
+def finished(job):
+    job.wait(timeout=5)
+    while not job.finished:
+        job.wait(job.version, timeout=5)
+    return job
+
+def test_only_the_last_watcher_cancels(manager):
+    job = manager.submit("key", until_cancelled)
+    assert manager.submit("key", until_cancelled) is job
+    assert job.watchers == 2
+
+    assert not job.detach()
+    assert not job.cancel.is_set()
+    assert job.detach()
+    assert job.cancel.is_set()
+    assert finished(job).result == "stopped"
+
+def test_a_cancelled_job_is_not_joined(manager):
+    job = manager.submit("key", until_cancelled)
+    job.detach()
+    other = manager.submit("key", until_cancelled)
+    assert other is not job and other.watchers == 1
+    other.detach()
+
+def test_finished_results_are_reused_until_the_ttl(manager):
+    job = finished(manager.submit("key", lambda job: "result"))
+    assert job.status == DONE
+    # Collecting the result doesn't cancel or drop it
+    assert job.detach() and not job.cancel.is_set()
+    assert manager.submit("key", lambda job: "again") is job
+    assert job.result == "result"
+
+    manager.ttl = 0
+    assert manager.submit("key", lambda job: "again") is not job
+
+def test_join_and_detach_race(manager):
+    # A session joining as the last watcher leaves either shares a live job or
+    # gets a new one, never one that has just been cancelled
+    for i in range(200):
+        job = manager.submit(("key", i), until_cancelled)
+        joined = []
+        joiner = threading.Thread(target=lambda: joined.append(manager.submit(("key", i), until_cancelled)))
+        joiner.start()
+        job.detach()
+        joiner.join()
+        if joined[0] is job:
+            assert not job.cancel.is_set() and job.watchers == 1
+        else:
+            assert job.cancel.is_set() and joined[0].watchers == 1
+        joined[0].cancel.set()